@@ -0,0 +1,18 @@
+from django.contrib.auth.backends import ModelBackend
+
+from . import object_cache
+
+
+class CachedModelBackend(ModelBackend):
+    """ModelBackend, берущий пользователя сессии из кеша объектов.
+
+    Кеш сбрасывается при сохранении пользователя (смена пароля в том
+    числе) и при выходе, поэтому проверка хеша пароля в сессии видит
+    актуальный пароль.
+    """
+
+    def get_user(self, user_id):
+        user = object_cache.get_user_by_id(user_id)
+        if user is not None and self.user_can_authenticate(user):
+            return user
+        return None
@@ -0,0 +1,128 @@
+import hashlib
+import math
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+
+# Меньший фильтр почти весь заполнен единицами и пропускает всё подряд.
+MIN_CAPACITY = 1024
+
+
+class BloomFilter:
+    """Фильтр Блума: «точно нет» или «возможно есть»."""
+
+    def __init__(self, capacity, error_rate):
+        capacity = max(capacity, MIN_CAPACITY)
+        self.size = max(8, math.ceil(
+            -capacity * math.log(error_rate) / math.log(2) ** 2
+        ))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    @classmethod
+    def from_items(cls, items, error_rate):
+        items = list(items)
+        bloom = cls(len(items), error_rate)
+        for item in items:
+            bloom.add(item)
+        return bloom
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        second = int.from_bytes(digest[8:], 'little') | 1
+        return ((first + i * second) % self.size
+                for i in range(self.hashes))
+
+    def add(self, item):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item):
+        return all(self.bits[position >> 3] & (1 << (position & 7))
+                   for position in self._positions(item))
+
+
+class SharedNameFilter:
+    """Фильтр Блума по значениям столбца, общий для всех процессов.
+
+    Поколение фильтра хранится в кеше. add() после создания объекта
+    дописывает значение в фильтр и кладёт его в кеш под новым поколением;
+    invalidate() после переименования или удаления увеличивает поколение,
+    и процесс, заметивший его, строит фильтр заново по БД.
+    """
+
+    def __init__(self, name, load_values):
+        self.name = name
+        self.load_values = load_values
+        self._current = (None, None)
+
+    @property
+    def _generation_key(self):
+        return f'bloom:{self.name}:generation'
+
+    def generation(self):
+        """Начинается с текущего времени, а не с 1: после очистки кеша
+        процесс не должен принять свой старый фильтр за актуальный."""
+        generation = cache.get(self._generation_key)
+        if generation is None:
+            cache.add(self._generation_key, time.time_ns(), None)
+            generation = cache.get(self._generation_key)
+        return generation
+
+    def _bump(self):
+        try:
+            cache.incr(self._generation_key)
+        except ValueError:
+            cache.add(self._generation_key, time.time_ns(), None)
+
+    def invalidate(self):
+        """Сразу и ещё раз после коммита: до коммита другой процесс мог
+        построить фильтр без нового значения."""
+        self._bump()
+        transaction.on_commit(self._bump)
+
+    def _key(self, generation):
+        return f'bloom:{self.name}:{generation}'
+
+    def add(self, value):
+        """Новое значение сразу видно этому процессу, остальным - после
+        коммита, без полного перестроения фильтра."""
+        self.current().add(value)
+        transaction.on_commit(lambda: self._store_added(value))
+
+    def _store_added(self, value):
+        self.generation()
+        generation = cache.incr(self._generation_key)
+        bloom = cache.get(self._key(generation - 1))
+        if bloom is None:
+            # Фильтр предыдущего поколения ещё не сохранён или вытеснен:
+            # новый построит по БД первый, кто его запросит.
+            return
+        bloom.add(value)
+        cache.set(self._key(generation), bloom, settings.BLOOM_FILTER_TTL)
+        self._current = (generation, bloom)
+
+    def _load(self, generation):
+        key = self._key(generation)
+        bloom = cache.get(key)
+        if bloom is None:
+            bloom = BloomFilter.from_items(self.load_values(),
+                                           settings.BLOOM_FILTER_ERROR_RATE)
+            cache.set(key, bloom, settings.BLOOM_FILTER_TTL)
+        self._current = (generation, bloom)
+        return bloom
+
+    def current(self):
+        """Фильтр текущего поколения."""
+        generation = self.generation()
+        current_generation, bloom = self._current
+        if current_generation != generation:
+            bloom = self._load(generation)
+        return bloom
+
+    def __contains__(self, value):
+        return value in self.current()
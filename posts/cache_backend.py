@@ -0,0 +1,268 @@
+import math
+import os
+import pickle
+import random
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS cache ('
+    ' key TEXT PRIMARY KEY, value BLOB NOT NULL,'
+    ' expires REAL, delta REAL NOT NULL DEFAULT 0)',
+    'CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires)',
+    'CREATE TABLE IF NOT EXISTS cache_lock ('
+    ' key TEXT PRIMARY KEY, expires REAL NOT NULL)',
+)
+
+
+class SQLiteCache(BaseCache):
+    """Общий для всех процессов машины кеш в файле SQLite (WAL + mmap).
+
+    Защита от «давки» при истечении горячего ключа:
+
+    * после истечения TTL значение ещё STALE_GRACE секунд хранится;
+      пересчитывать его идёт один процесс, взявший блокировку, а
+      остальные получают старое значение;
+    * до истечения TTL get() с растущей вероятностью сообщает о промахе
+      одному процессу (XFetch), чтобы ключ обновился заранее. Время
+      пересчёта delta измеряется между промахом get() и set() того же
+      ключа в том же потоке. Поток помнит не больше MISSES_SIZE последних
+      промахов: ключи, которые так и не записываются (404, боты),
+      вытесняются.
+
+    add(), has_key() и incr() считают устаревшее значение отсутствующим.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self._path = location
+        options = params.get('OPTIONS', {})
+        self._grace = options.get('STALE_GRACE', 60)
+        self._beta = options.get('EARLY_REFRESH_BETA', 1.0)
+        self._lock_timeout = options.get('LOCK_TIMEOUT', 30)
+        self._mmap_size = options.get('MMAP_SIZE', 64 * 1024 * 1024)
+        self._misses_size = options.get('MISSES_SIZE', 1000)
+        self._local = threading.local()
+
+    @property
+    def _connection(self):
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            directory = os.path.dirname(self._path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(self._path, timeout=10,
+                                         isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute(f'PRAGMA mmap_size={int(self._mmap_size)}')
+            for statement in SCHEMA:
+                connection.execute(statement)
+            local.connection = connection
+            local.pid = os.getpid()
+            # Когда поток получил промах по ключу: для замера delta в set().
+            local.misses = OrderedDict()
+        return local.connection
+
+    def _transaction(self):
+        return _Transaction(self._connection)
+
+    @property
+    def _misses(self):
+        return self._connection and self._local.misses
+
+    def _miss(self, key):
+        misses = self._misses
+        misses[key] = time.monotonic()
+        misses.move_to_end(key)
+        while len(misses) > self._misses_size:
+            misses.popitem(last=False)
+
+    def _acquire(self, key, now):
+        """Блокировка пересчёта ключа одним процессом на LOCK_TIMEOUT."""
+        connection = self._connection
+        connection.execute(
+            'DELETE FROM cache_lock WHERE key = ? AND expires < ?', (key, now)
+        )
+        try:
+            connection.execute('INSERT INTO cache_lock VALUES (?, ?)',
+                               (key, now + self._lock_timeout))
+        except sqlite3.IntegrityError:
+            return False
+        return True
+
+    def _lookup(self, key, row, now):
+        """(попадание, значение) с учётом устаревания и раннего обновления."""
+        if row is None:
+            self._miss(key)
+            return False, None
+        value, expires, delta = row
+        if expires is not None:
+            if now >= expires + self._grace:
+                self._miss(key)
+                return False, None
+            if now >= expires or (
+                    self._beta and delta
+                    and now - delta * self._beta * math.log(
+                        1.0 - random.random()) >= expires):
+                if self._acquire(key, now):
+                    self._miss(key)
+                    return False, None
+        return True, pickle.loads(value)
+
+    def _expires(self, timeout):
+        return self.get_backend_timeout(timeout)
+
+    def _row(self, key, value, timeout):
+        started = self._misses.pop(key, None)
+        delta = time.monotonic() - started if started is not None else 0
+        return (key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL),
+                self._expires(timeout), delta)
+
+    def _cull(self, now):
+        connection = self._connection
+        connection.execute('DELETE FROM cache WHERE expires < ?',
+                           (now - self._grace,))
+        count = connection.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        if count > self._max_entries and self._cull_frequency:
+            connection.execute(
+                'DELETE FROM cache WHERE key IN (SELECT key FROM cache '
+                'ORDER BY expires IS NULL, expires LIMIT ?)',
+                (count // self._cull_frequency,)
+            )
+
+    def get(self, key, default=None, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        row = self._connection.execute(
+            'SELECT value, expires, delta FROM cache WHERE key = ?', (key,)
+        ).fetchone()
+        hit, value = self._lookup(key, row, time.time())
+        return value if hit else default
+
+    def get_many(self, keys, version=None):
+        keys = {self.make_key(key, version=version): key for key in keys}
+        for key in keys:
+            self.validate_key(key)
+        if not keys:
+            return {}
+        rows = dict.fromkeys(keys)
+        placeholders = ', '.join('?' * len(keys))
+        for key, *row in self._connection.execute(
+                'SELECT key, value, expires, delta FROM cache '
+                f'WHERE key IN ({placeholders})', list(keys)):
+            rows[key] = row
+        now = time.time()
+        result = {}
+        for key, row in rows.items():
+            hit, value = self._lookup(key, row, now)
+            if hit:
+                result[keys[key]] = value
+        return result
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.set_many({key: value}, timeout, version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        rows = []
+        for key, value in data.items():
+            key = self.make_key(key, version=version)
+            self.validate_key(key)
+            rows.append(self._row(key, value, timeout))
+        now = time.time()
+        # timeout=0 по контракту Django удаляет ключ сразу, без STALE_GRACE.
+        expired = [row[:1] for row in rows
+                   if row[2] is not None and row[2] <= now]
+        with self._transaction() as connection:
+            connection.executemany(
+                'INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?)', rows
+            )
+            connection.executemany('DELETE FROM cache WHERE key = ?',
+                                   expired)
+            connection.executemany('DELETE FROM cache_lock WHERE key = ?',
+                                   [row[:1] for row in rows])
+            self._cull(now)
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        with self._transaction() as connection:
+            cursor = connection.execute(
+                'INSERT INTO cache VALUES (?, ?, ?, ?) '
+                'ON CONFLICT (key) DO UPDATE SET value = excluded.value, '
+                'expires = excluded.expires, delta = excluded.delta '
+                'WHERE cache.expires <= ?',
+                (*self._row(key, value, timeout), time.time())
+            )
+            return cursor.rowcount == 1
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        cursor = self._connection.execute(
+            'UPDATE cache SET expires = ? WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)',
+            (self._expires(timeout), key, time.time())
+        )
+        return cursor.rowcount == 1
+
+    def has_key(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return self._connection.execute(
+            'SELECT 1 FROM cache WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)', (key, time.time())
+        ).fetchone() is not None
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        with self._transaction() as connection:
+            row = connection.execute(
+                'SELECT value FROM cache WHERE key = ? '
+                'AND (expires IS NULL OR expires > ?)', (key, time.time())
+            ).fetchone()
+            if row is None:
+                raise ValueError(f"Key '{key}' not found")
+            value = pickle.loads(row[0]) + delta
+            connection.execute(
+                'UPDATE cache SET value = ? WHERE key = ?',
+                (pickle.dumps(value, pickle.HIGHEST_PROTOCOL), key)
+            )
+        return value
+
+    def delete(self, key, version=None):
+        self.delete_many([key], version)
+
+    def delete_many(self, keys, version=None):
+        keys = [(self.make_key(key, version=version),) for key in keys]
+        for key, in keys:
+            self.validate_key(key)
+        with self._transaction() as connection:
+            connection.executemany('DELETE FROM cache WHERE key = ?', keys)
+            connection.executemany('DELETE FROM cache_lock WHERE key = ?',
+                                   keys)
+
+    def clear(self):
+        with self._transaction() as connection:
+            connection.execute('DELETE FROM cache')
+            connection.execute('DELETE FROM cache_lock')
+
+
+class _Transaction:
+    """BEGIN IMMEDIATE ... COMMIT: запись без гонок между процессами."""
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        self.connection.execute('BEGIN IMMEDIATE')
+        return self.connection
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.connection.execute('ROLLBACK' if exc_type else 'COMMIT')
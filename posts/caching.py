@@ -0,0 +1,68 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+FEED_GENERATION_KEY = 'index_page:generation'
+RECENT_WRITE_SESSION_KEY = 'posts_recent_write'
+
+
+def feed_generation():
+    """Текущее поколение кеша общей ленты."""
+    generation = cache.get(FEED_GENERATION_KEY)
+    if generation is None:
+        cache.add(FEED_GENERATION_KEY, 1, None)
+        generation = cache.get(FEED_GENERATION_KEY, 1)
+    return generation
+
+
+def bump_feed_generation():
+    """Делает устаревшими все закешированные страницы общей ленты."""
+    try:
+        return cache.incr(FEED_GENERATION_KEY)
+    except ValueError:
+        cache.add(FEED_GENERATION_KEY, 2, None)
+        return feed_generation()
+
+
+def feed_page_key(page):
+    """Стабильный ключ страницы: курсор или номер, а не str(page)."""
+    return getattr(page, 'cursor', None) or page.number
+
+
+def mark_recent_write(request):
+    """Запоминает запись пользователя, чтобы он сразу увидел её в ленте.
+
+    Само поколение меняют сигналы posts.signals после коммита: иначе
+    параллельный запрос успел бы закешировать ленту без новой записи
+    уже под новым поколением.
+    """
+    request.session[RECENT_WRITE_SESSION_KEY] = time.time()
+
+
+def bypass_feed_cache(request):
+    """Только что писавший пользователь читает ленту мимо кеша.
+
+    Поколение хранится в кеше, и другой процесс или реплика кеша может
+    какое-то время видеть старое поколение.
+    """
+    if not request.user.is_authenticated:
+        return False
+    written_at = request.session.get(RECENT_WRITE_SESSION_KEY)
+    return (written_at is not None
+            and time.time() - written_at < settings.FEED_CACHE_BYPASS)
+
+
+def feed_cache_context(request, page):
+    """Фрагмент ленты общий для анонимов и свой у каждого пользователя.
+
+    В карточках есть ссылка на правку для автора поста; сами карточки
+    кешируются отдельно и между пользователями (post_cards).
+    """
+    viewer = request.user.pk if request.user.is_authenticated else 0
+    return {
+        'feed_cache_ttl': settings.FEED_CACHE_TTL,
+        'feed_cache_key':
+            f'{feed_generation()}:{feed_page_key(page)}:{viewer}',
+        'feed_cache_bypass': bypass_feed_cache(request),
+    }
@@ -0,0 +1,46 @@
+import hashlib
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe, quote_etag
+
+
+def page_key(page):
+    """Положение страницы в ленте: номер и число страниц или курсоры."""
+    if getattr(page, 'is_cursor', False):
+        return (page.previous_cursor, page.next_cursor)
+    return (page.number, page.paginator.num_pages)
+
+
+def page_etag(request, posts, *parts):
+    """ETag страницы из уже загруженных постов.
+
+    Post.updated меняется при правке поста и при добавлении или удалении
+    комментария, поэтому отдельный запрос к комментариям не нужен.
+    parts - всё остальное, что видно на странице: счётчики, подписка...
+    Last-Modified не отдаётся: у подписки, входа, удаления поста или
+    правки группы нет времени изменения, и If-Modified-Since без ETag
+    получал бы 304 на устаревшую страницу.
+    """
+    viewer = request.user.pk if request.user.is_authenticated else 0
+    versions = [(post.pk, post.updated.timestamp()) for post in posts]
+    digest = hashlib.md5(repr((viewer, parts, versions)).encode())
+    return quote_etag(digest.hexdigest())
+
+
+def not_modified(request, etag):
+    """Ответ 304, если копия клиента актуальна, иначе None."""
+    response = get_conditional_response(request, etag=etag)
+    if response is not None:
+        response['ETag'] = etag
+    return response
+
+
+def conditional_response(request, response):
+    """304 вместо готового ответа по его собственным валидаторам."""
+    last_modified = response.get('Last-Modified')
+    return get_conditional_response(
+        request,
+        etag=response.get('ETag'),
+        last_modified=last_modified and parse_http_date_safe(last_modified),
+        response=response,
+    )
@@ -0,0 +1,79 @@
+from django.contrib.auth import get_user_model
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+User = get_user_model()
+
+
+def _count(queryset, field):
+    """Подзапрос COUNT(*) по строкам queryset, связанным с field."""
+    return Coalesce(
+        Subquery(
+            queryset.filter(**{field: OuterRef('pk')}).order_by().values(
+                field
+            ).annotate(total=Count('pk')).values('total'),
+            output_field=IntegerField(),
+        ),
+        0,
+    )
+
+
+def actual_post_counters(post_model, comment_model):
+    return post_model.objects.annotate(
+        actual_comments=_count(comment_model.objects, 'post')
+    ).order_by()
+
+
+def actual_user_counters(user_model, post_model, follow_model):
+    return user_model.objects.annotate(
+        actual_posts=_count(post_model.objects, 'author'),
+        actual_followers=_count(follow_model.objects, 'author'),
+        actual_following=_count(follow_model.objects, 'user'),
+    ).order_by()
+
+
+def repair(post_model, comment_model, follow_model, stats_model,
+           user_model=User, batch_size=500):
+    """Пересчитывает счётчики и исправляет расходящиеся.
+
+    Исправленные посты получают новый updated, чтобы их карточки
+    перерисовались. Возвращает (исправлено постов, исправлено
+    пользователей).
+    """
+    fixed_posts = []
+    now = timezone.now()
+    posts = actual_post_counters(post_model, comment_model).values_list(
+        'pk', 'comments_count', 'actual_comments'
+    )
+    for pk, stored, actual in posts.iterator():
+        if stored != actual:
+            fixed_posts.append(post_model(pk=pk, comments_count=actual,
+                                          updated=now))
+    post_model.objects.bulk_update(fixed_posts,
+                                   ['comments_count', 'updated'],
+                                   batch_size=batch_size)
+
+    created, updated = [], []
+    users = actual_user_counters(
+        user_model, post_model, follow_model
+    ).values_list(
+        'pk', 'stats__user', 'stats__posts_count', 'stats__followers_count',
+        'stats__following_count', 'actual_posts', 'actual_followers',
+        'actual_following'
+    )
+    for pk, stats_id, *counters in users.iterator():
+        stored, actual = counters[:3], counters[3:]
+        stats = stats_model(user_id=pk, posts_count=actual[0],
+                            followers_count=actual[1],
+                            following_count=actual[2])
+        if stats_id is None:
+            created.append(stats)
+        elif stored != actual:
+            updated.append(stats)
+    stats_model.objects.bulk_create(created, batch_size=batch_size)
+    stats_model.objects.bulk_update(
+        updated, ['posts_count', 'followers_count', 'following_count'],
+        batch_size=batch_size
+    )
+    return len(fixed_posts), len(created) + len(updated)
@@ -0,0 +1,106 @@
+import heapq
+from datetime import datetime, timedelta, timezone
+
+from django.conf import settings
+from django.db.models import Max, Min
+
+from .models import Follow, Post
+from .pagination import (
+    NEXT, CursorPaginator, keyset_order, keyset_q, paginate,
+)
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+AUTHOR_CHUNK = 500
+
+
+def _micros(pub_date):
+    return (pub_date - EPOCH) // timedelta(microseconds=1)
+
+
+class MergeFeedPaginator(CursorPaginator):
+    """Лента подписок как k-way слияние потоков постов по авторам.
+
+    object_list - список id авторов. Для каждого автора одним запросом
+    берётся крайняя дата поста за курсором, затем посты дочитываются
+    пачками только у тех авторов, чья очередь дошла до вершины кучи.
+    """
+
+    def _sort_key(self, direction, post):
+        sign = 1 if direction == NEXT else -1
+        return (-sign * _micros(post.pub_date), -sign * post.pk)
+
+    def _heads(self, direction, key):
+        edge = Max('pub_date') if direction == NEXT else Min('pub_date')
+        sign = 1 if direction == NEXT else -1
+        author_ids = self.object_list
+        for start in range(0, len(author_ids), AUTHOR_CHUNK):
+            rows = Post.objects.filter(
+                keyset_q(direction, key),
+                author_id__in=author_ids[start:start + AUTHOR_CHUNK],
+            ).values('author_id').annotate(edge=edge).order_by()
+            for row in rows:
+                yield (-sign * _micros(row['edge']), float('-inf')), row
+
+    def _stream(self, direction, key, author_id, chunk):
+        while True:
+            posts = list(
+                Post.objects.for_listing().filter(
+                    keyset_q(direction, key), author_id=author_id
+                ).order_by(*keyset_order(direction))[:chunk]
+            )
+            yield from posts
+            if len(posts) < chunk:
+                return
+            key = (posts[-1].pub_date, posts[-1].pk)
+
+    def fetch(self, direction, key, limit):
+        heap = []
+        for sort_key, row in self._heads(direction, key):
+            heap.append((sort_key, row['author_id'], None))
+        heapq.heapify(heap)
+        streams = {}
+        result = []
+        while heap and len(result) < limit:
+            _, author_id, post = heapq.heappop(heap)
+            if post is not None:
+                result.append(post)
+            else:
+                streams[author_id] = self._stream(direction, key,
+                                                  author_id, limit)
+            following = next(streams[author_id], None)
+            if following is not None:
+                heapq.heappush(heap, (self._sort_key(direction, following),
+                                      author_id, following))
+        return result
+
+
+def followed_posts_join(user):
+    return Post.objects.for_listing().filter(author__following__user=user)
+
+
+def followed_posts_timeline(user):
+    return Post.objects.for_listing().filter(
+        timeline_entries__user=user
+    ).order_by('-timeline_entries__pub_date')
+
+
+FOLLOW_FEED_QUERIES = {
+    'join': followed_posts_join,
+    'timeline': followed_posts_timeline,
+}
+
+
+def follow_feed_page(request):
+    """Страница ленты подписок движком из FOLLOW_FEED_ENGINE."""
+    engine = settings.FOLLOW_FEED_ENGINE
+    if engine == 'merge' and 'page' not in request.GET:
+        author_ids = list(
+            Follow.objects.filter(user=request.user).values_list(
+                'author_id', flat=True
+            )
+        )
+        return MergeFeedPaginator(
+            author_ids, settings.POSTS_PER_PAGE
+        ).get_page(request.GET.get('cursor'))
+    query = FOLLOW_FEED_QUERIES.get(engine, followed_posts_join)
+    return paginate(request, query(request.user))
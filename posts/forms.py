@@ -1,7 +1,9 @@
 from django import forms
+from django.core.files.uploadedfile import UploadedFile
 from django.forms import ModelForm
 
 from .models import Comment, Post
+from .uploads import prepare_image
 
 
 class PostForm(ModelForm):
@@ -15,6 +17,12 @@ class PostForm(ModelForm):
             },
         }
 
+    def clean_image(self):
+        image = self.cleaned_data['image']
+        if isinstance(image, UploadedFile):
+            return prepare_image(image)
+        return image
+
 
 class CommentForm(ModelForm):
     class Meta:
@@ -0,0 +1,351 @@
+import csv
+import json
+import time
+from datetime import datetime
+
+from django.apps.registry import Apps
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import models, transaction
+from django.utils import timezone
+
+from . import object_cache, recommendations, timeline
+from .caching import bump_feed_generation
+from .counters import repair
+from .models import Comment, Follow, Group, Post, UserStats
+from .page_cache import group_tag, purge
+
+User = get_user_model()
+
+TYPES = ('group', 'post', 'comment', 'follow')
+# Как часто печатать скорость загрузки, секунд
+REPORT_INTERVAL = 5
+# username, slug и id поста - строка или целое число, остальные
+# поля - строки: запись с полем другого типа пропускается.
+KEY_FIELDS = ('id', 'post', 'author', 'user', 'group', 'slug')
+NAME_FIELDS = ('author', 'user', 'group', 'slug')
+TEXT_FIELDS = ('text', 'title', 'description', 'pub_date', 'created')
+
+
+class RecordError(ValueError):
+    """Запись, которую нельзя загрузить."""
+
+
+def read_jsonl(stream):
+    """Битая строка не прерывает загрузку: вместо записи - RecordError."""
+    for line_number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as error:
+            record = RecordError(f'битый JSON: {error}')
+        yield line_number, record
+
+
+def read_csv(stream):
+    """CSV с колонкой type и объединением колонок всех типов записей."""
+    for line_number, row in enumerate(csv.DictReader(stream), 2):
+        yield line_number, {key: value for key, value in row.items()
+                            if value not in (None, '')}
+
+
+READERS = {'jsonl': read_jsonl, 'csv': read_csv}
+
+
+def check_types(record):
+    """Приводит имена к строкам; RecordError, если тип поля не подходит."""
+    for field in KEY_FIELDS:
+        value = record.get(field)
+        if value is None:
+            continue
+        if isinstance(value, bool) or not isinstance(value, (str, int)):
+            raise RecordError(f'{field} - не строка и не число')
+        if field in NAME_FIELDS:
+            record[field] = str(value)
+    for field in TEXT_FIELDS:
+        value = record.get(field)
+        if value is not None and not isinstance(value, str):
+            raise RecordError(f'{field} - не строка')
+
+
+def _parse_date(value):
+    if value is None:
+        return timezone.now()
+    date = datetime.fromisoformat(value)
+    if timezone.is_naive(date):
+        date = timezone.make_aware(date)
+    return date
+
+
+def _import_model(model, date_field):
+    """Копия model для bulk_create, где date_field - обычное поле.
+
+    auto_now_add заменил бы дату из файла временем загрузки. Копия живёт
+    в отдельном реестре моделей, как исторические модели миграций, поэтому
+    сама Post или Comment не меняется; связи в ней - просто колонки id.
+    """
+    attrs = {'__module__': __name__}
+    for field in model._meta.concrete_fields:
+        if field.is_relation:
+            attrs[field.attname] = models.IntegerField(null=field.null)
+            continue
+        _, _, args, kwargs = field.deconstruct()
+        if field.name == date_field:
+            kwargs.pop('auto_now_add')
+        attrs[field.name] = type(field)(*args, **kwargs)
+    attrs['Meta'] = type('Meta', (), {
+        'apps': IMPORT_APPS, 'app_label': model._meta.app_label,
+        'db_table': model._meta.db_table, 'managed': False,
+    })
+    return type(f'Imported{model.__name__}', (models.Model,), attrs)
+
+
+IMPORT_APPS = Apps()
+ImportedPost = _import_model(Post, 'pub_date')
+ImportedComment = _import_model(Comment, 'created')
+
+
+class PostImporter:
+    """Потоковая загрузка групп, постов, комментариев и подписок.
+
+    Записи копятся в буферах и пишутся bulk_create по batch_size штук,
+    каждая пачка - в своей транзакции. В памяти держатся только буферы
+    и словари username -> id и slug -> id.
+
+    Формат записей (JSONL или CSV с теми же именами колонок):
+    group: slug, title, description;
+    post: id (необязательно, станет pk), author, group, text, pub_date;
+    comment: post (pk поста), author, text, created;
+    follow: user, author.
+    Неизвестные авторы создаются без пароля.
+    """
+
+    def __init__(self, batch_size=1000, log=None):
+        self.batch_size = batch_size
+        self.log = log or (lambda message: None)
+        self.users = {}
+        self.groups = {}
+        self.buffers = {name: [] for name in TYPES}
+        self.counts = dict.fromkeys(TYPES, 0)
+        self.skipped = 0
+        # Явные id постов из файла, занятые в базе: комментарии к ним
+        # не привязываются к чужим постам. Растёт только с конфликтами.
+        self.rejected_posts = set()
+        self.touched_authors = set()
+        self.touched_groups = set()
+        self.started = self.reported = None
+
+    def run(self, records):
+        """records - итератор (номер строки, dict). Возвращает self."""
+        self.started = self.reported = time.monotonic()
+        last_follow = Follow.objects.order_by('-pk').values_list(
+            'pk', flat=True
+        ).first() or 0
+        for line_number, record in records:
+            if isinstance(record, RecordError):
+                self.skip(line_number, record)
+                continue
+            if not isinstance(record, dict):
+                self.skip(line_number, 'запись - не объект')
+                continue
+            kind = record.get('type')
+            if kind not in self.buffers:
+                self.skip(line_number, f'неизвестный тип {kind!r}')
+                continue
+            try:
+                check_types(record)
+            except RecordError as error:
+                self.skip(line_number, error)
+                continue
+            self.buffers[kind].append((line_number, record))
+            if sum(map(len, self.buffers.values())) >= self.batch_size:
+                self.flush()
+        self.flush()
+        self.finish(last_follow)
+        return self
+
+    def skip(self, line_number, reason):
+        self.skipped += 1
+        self.log(f'Строка {line_number} пропущена: {reason}')
+
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    def flush(self):
+        with transaction.atomic():
+            self._flush_groups()
+            self._resolve_users()
+            self._flush_posts()
+            self._flush_comments()
+            self._flush_follows()
+        if time.monotonic() - self.reported >= REPORT_INTERVAL:
+            self.reported = time.monotonic()
+            self.log(self.progress())
+
+    def progress(self):
+        total = sum(self.counts.values())
+        return (f'Загружено {total} записей, '
+                f'{total / max(self.elapsed(), 1e-9):.0f} в секунду')
+
+    def _resolve_users(self):
+        names = set()
+        for kind in ('post', 'comment', 'follow'):
+            for _, record in self.buffers[kind]:
+                names.update(record.get(field) for field in ('author', 'user'))
+        names -= set(self.users)
+        names.discard(None)
+        if not names:
+            return
+        self.users.update(User.objects.filter(
+            username__in=names
+        ).values_list('username', 'pk'))
+        missing = names - set(self.users)
+        User.objects.bulk_create(
+            [User(username=name, password=make_password(None))
+             for name in missing],
+            ignore_conflicts=True,
+        )
+        self.users.update(User.objects.filter(
+            username__in=missing
+        ).values_list('username', 'pk'))
+
+    def _flush_groups(self):
+        records, self.buffers['group'] = self.buffers['group'], []
+        groups = {}
+        for line_number, record in records:
+            if 'slug' not in record:
+                self.skip(line_number, 'у группы нет slug')
+                continue
+            groups[record['slug']] = Group(
+                slug=record['slug'],
+                title=record.get('title', record['slug']),
+                description=record.get('description', ''),
+            )
+        Group.objects.bulk_create(groups.values(), ignore_conflicts=True)
+        self.groups.update(Group.objects.filter(
+            slug__in=groups
+        ).values_list('slug', 'pk'))
+        self.counts['group'] += len(groups)
+
+    def _group_id(self, slug):
+        if slug is None:
+            return None
+        if slug not in self.groups:
+            group = Group.objects.filter(slug=slug).values_list(
+                'pk', flat=True
+            ).first()
+            if group is None:
+                raise RecordError(f'нет группы {slug!r}')
+            self.groups[slug] = group
+        return self.groups[slug]
+
+    def _build(self, kind, build):
+        records, self.buffers[kind] = self.buffers[kind], []
+        objects = []
+        for line_number, record in records:
+            try:
+                objects.append(build(record))
+            except KeyError as error:
+                self.skip(line_number, f'нет значения {error}')
+            except (RecordError, TypeError, ValueError) as error:
+                self.skip(line_number, error)
+        self.counts[kind] += len(objects)
+        return objects
+
+    def _flush_posts(self):
+        ids = set()
+        for _, record in self.buffers['post']:
+            try:
+                ids.add(int(record['id']))
+            except (KeyError, TypeError, ValueError):
+                pass
+        # Повтор id из прошлых пачек уже лежит в базе и попадёт в taken.
+        taken = set(Post.objects.filter(pk__in=ids).values_list(
+            'pk', flat=True
+        ))
+        batch = set()
+
+        def build(record):
+            post_id = record.get('id')
+            if post_id is not None:
+                post_id = int(post_id)
+                if post_id in taken:
+                    self.rejected_posts.add(post_id)
+                    raise RecordError(f'пост {post_id} уже есть в базе')
+                if post_id in batch:
+                    raise RecordError(f'id {post_id} повторяется в пачке')
+            post = ImportedPost(id=post_id, text=record['text'],
+                                author_id=self.users[record['author']],
+                                group_id=self._group_id(record.get('group')),
+                                pub_date=_parse_date(record.get('pub_date')))
+            batch.add(post_id)
+            self.touched_authors.add(post.author_id)
+            self.touched_groups.add(post.group_id)
+            return post
+        posts = self._build('post', build)
+        ImportedPost.objects.bulk_create(posts)
+        object_cache.forget('post', *(post.pk for post in posts if post.pk))
+
+    def _flush_comments(self):
+        post_ids = set()
+        for _, record in self.buffers['comment']:
+            try:
+                post_ids.add(int(record.get('post')))
+            except (TypeError, ValueError):
+                pass
+        existing = set(Post.objects.filter(pk__in=post_ids).values_list(
+            'pk', flat=True
+        ))
+
+        def build(record):
+            post_id = int(record['post'])
+            if post_id in self.rejected_posts:
+                raise RecordError(f'пост {post_id} не загружен')
+            if post_id not in existing:
+                raise RecordError(f'нет поста {post_id}')
+            return ImportedComment(
+                post_id=post_id, text=record['text'],
+                author_id=self.users[record['author']],
+                created=_parse_date(record.get('created')),
+            )
+        ImportedComment.objects.bulk_create(self._build('comment', build))
+
+    def _flush_follows(self):
+        def build(record):
+            if record['user'] == record['author']:
+                raise RecordError('подписка на себя')
+            return Follow(user_id=self.users[record['user']],
+                          author_id=self.users[record['author']])
+        Follow.objects.bulk_create(self._build('follow', build),
+                                   ignore_conflicts=True)
+
+    def finish(self, last_follow):
+        """То, что при обычной записи делают сигналы и views."""
+        self.log('Пересчёт счётчиков и лент подписок...')
+        repair(Post, Comment, Follow, UserStats)
+        follows = Follow.objects.filter(pk__gt=last_follow).values_list(
+            'user_id', 'author_id'
+        )
+        followers = []
+        for user_id, author_id in follows.iterator():
+            timeline.backfill(user_id, author_id)
+            followers.append(user_id)
+            if len(followers) >= self.batch_size:
+                recommendations.mark_stale(*followers)
+                followers = []
+        recommendations.mark_stale(*followers)
+        authors = sorted(self.touched_authors)
+        for start in range(0, len(authors), self.batch_size):
+            follows = Follow.objects.filter(
+                pk__lte=last_follow,
+                author_id__in=authors[start:start + self.batch_size],
+            ).values_list('user_id', 'author_id')
+            for user_id, author_id in follows.iterator():
+                timeline.backfill(user_id, author_id)
+        object_cache.usernames.invalidate()
+        object_cache.group_slugs.invalidate()
+        bump_feed_generation()
+        purge('feed',
+              *(f'author:{author_id}' for author_id in self.touched_authors),
+              *(group_tag(group_id) for group_id in self.touched_groups))
@@ -0,0 +1,253 @@
+import cProfile
+import os
+import random
+import socket
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.db import connections
+from django.template.backends.django import DjangoTemplates, Template
+
+METRICS = ('queries', 'db_time', 'render_time', 'wall_time')
+# Реестр процессов: слоты 1..REQUEST_STATS_MAX_PROCESSES с ключом сводки.
+# Процесс занимает свободный слот через add, и слот живёт, как и сводка,
+# REQUEST_STATS_TTL: publish() его продлевает, слот остановленного
+# процесса освобождается сам.
+REGISTRY_SLOT = 'request_stats:slot:{}'
+PROFILING_SALT = 'posts.instrumentation.profiling'
+
+_local = threading.local()
+_slot = None
+
+
+class RollingStats:
+    """Последние REQUEST_STATS_WINDOW замеров по каждому view процесса."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._samples = defaultdict(self._new_window)
+
+    def _new_window(self):
+        return deque(maxlen=settings.REQUEST_STATS_WINDOW)
+
+    def record(self, view, **sample):
+        with self._lock:
+            self._samples[view].append(sample)
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+
+    def summary(self):
+        """{view: {'count', '<metric>_sum', 'wall_time_max'}}."""
+        with self._lock:
+            samples = {view: list(window)
+                       for view, window in self._samples.items()}
+        result = {}
+        for view, window in samples.items():
+            row = {'count': len(window)}
+            for metric in METRICS:
+                row[f'{metric}_sum'] = sum(s[metric] for s in window)
+            row['wall_time_max'] = max(s['wall_time'] for s in window)
+            result[view] = row
+        return result
+
+
+stats = RollingStats()
+
+
+def _process_key():
+    return f'request_stats:{socket.gethostname()}:{os.getpid()}'
+
+
+def _slot_keys():
+    return [REGISTRY_SLOT.format(slot)
+            for slot in range(1, settings.REQUEST_STATS_MAX_PROCESSES + 1)]
+
+
+def _register(key):
+    """Занимает свободный слот под key; None, если свободных нет."""
+    slot_keys = _slot_keys()
+    taken = cache.get_many(slot_keys)
+    for slot_key in slot_keys:
+        if slot_key not in taken and cache.add(
+                slot_key, key, settings.REQUEST_STATS_TTL):
+            return slot_key
+    return None
+
+
+def _registered():
+    """Ключи сводок всех процессов из реестра."""
+    return set(cache.get_many(_slot_keys()).values())
+
+
+def publish():
+    """Выкладывает сводку процесса в общий кеш для других процессов."""
+    global _slot
+    key = _process_key()
+    cache.set(key, stats.summary(), settings.REQUEST_STATS_TTL)
+    # Слот пропадает по TTL и при очистке кеша, а после fork
+    # принадлежит родителю.
+    if not (_slot is not None and cache.get(_slot) == key
+            and cache.touch(_slot, settings.REQUEST_STATS_TTL)):
+        _slot = _register(key)
+
+
+def collect():
+    """Сводка по всем процессам, выложившим статистику, по убыванию времени.
+
+    Возвращает список строк с count и средними значениями метрик в мс.
+    """
+    # Свой процесс берётся из памяти: collect() не регистрирует его,
+    # и manage.py request_stats не занимает слот.
+    others = _registered() - {_process_key()}
+    summaries = [stats.summary(), *cache.get_many(list(others)).values()]
+    merged = defaultdict(lambda: defaultdict(float))
+    for summary in summaries:
+        for view, row in summary.items():
+            total = merged[view]
+            for field, value in row.items():
+                if field == 'wall_time_max':
+                    total[field] = max(total[field], value)
+                else:
+                    total[field] += value
+    rows = []
+    for view, total in merged.items():
+        count = int(total['count'])
+        row = {'view': view, 'count': count,
+               'wall_time_max': total['wall_time_max'] * 1000}
+        for metric in METRICS:
+            scale = 1 if metric == 'queries' else 1000
+            row[metric] = total[f'{metric}_sum'] * scale / count
+        rows.append(row)
+    return sorted(rows, key=lambda row: row['wall_time'] * row['count'],
+                  reverse=True)
+
+
+class _QueryTimer:
+    def __init__(self, measure):
+        self.measure = measure
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.measure['queries'] += 1
+            self.measure['db_time'] += time.perf_counter() - started
+
+
+class InstrumentedTemplate(Template):
+    def render(self, context=None, request=None):
+        measure = getattr(_local, 'measure', None)
+        if measure is None or measure['rendering']:
+            return super().render(context, request)
+        measure['rendering'] = True
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            measure['rendering'] = False
+            measure['render_time'] += time.perf_counter() - started
+
+
+class InstrumentedTemplates(DjangoTemplates):
+    """Шаблонный движок Django, замеряющий время рендеринга в запросе."""
+
+    def from_string(self, template_code):
+        template = super().from_string(template_code)
+        return InstrumentedTemplate(template.template, self)
+
+    def get_template(self, template_name):
+        template = super().get_template(template_name)
+        return InstrumentedTemplate(template.template, self)
+
+
+class RequestStatsMiddleware:
+    """Считает SQL-запросы, время БД, рендеринга и ответа по каждому view."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.published = 0.0
+
+    def __call__(self, request):
+        measure = {'queries': 0, 'db_time': 0.0, 'render_time': 0.0,
+                   'rendering': False}
+        _local.measure = measure
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(_QueryTimer(measure))
+                    )
+                response = self.get_response(request)
+        finally:
+            _local.measure = None
+        match = getattr(request, 'resolver_match', None)
+        if match is not None:
+            stats.record(
+                match.view_name,
+                queries=measure['queries'],
+                db_time=measure['db_time'],
+                render_time=measure['render_time'],
+                wall_time=time.perf_counter() - started,
+            )
+            now = time.monotonic()
+            if now - self.published > settings.REQUEST_STATS_PUBLISH_INTERVAL:
+                self.published = now
+                publish()
+        return response
+
+
+def profiling_token():
+    """Подписанное значение заголовка, включающего профилирование."""
+    return signing.TimestampSigner(salt=PROFILING_SALT).sign('profile')
+
+
+class ProfilingMiddleware:
+    """Профилирует cProfile каждый N-й запрос или запрос с заголовком.
+
+    Профиль view вместе с рендерингом шаблонов сохраняется в
+    PROFILING_DIR/<url name>/<время>-<pid>.prof.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def should_profile(self, request):
+        token = request.META.get(settings.PROFILING_HEADER)
+        if token:
+            try:
+                signing.TimestampSigner(salt=PROFILING_SALT).unsign(
+                    token, max_age=settings.PROFILING_TOKEN_MAX_AGE
+                )
+                return True
+            except signing.BadSignature:
+                return False
+        rate = settings.PROFILING_SAMPLE_RATE
+        return bool(rate) and random.randrange(rate) == 0
+
+    def __call__(self, request):
+        if not self.should_profile(request):
+            return self.get_response(request)
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            response = self.get_response(request)
+        finally:
+            profiler.disable()
+        match = getattr(request, 'resolver_match', None)
+        url_name = (match.url_name if match else None) or 'unresolved'
+        directory = os.path.join(settings.PROFILING_DIR, url_name)
+        os.makedirs(directory, exist_ok=True)
+        profiler.dump_stats(os.path.join(
+            directory, f'{time.strftime("%Y%m%d-%H%M%S")}-{os.getpid()}'
+                       f'-{random.getrandbits(16):04x}.prof'
+        ))
+        return response
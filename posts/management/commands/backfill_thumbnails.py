@@ -0,0 +1,58 @@
+from itertools import islice
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts import thumbnail_worker
+from posts.models import Post
+from posts.thumbnails import make_executor, ready_variants, refresh
+
+
+class Command(BaseCommand):
+    help = ('Создаёт недостающие варианты изображений карточек '
+            '(все ширины, JPEG и WebP) для уже загруженных постов.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument(
+            '--workers', type=int, default=settings.CARD_THUMBNAIL_WORKERS,
+            help='Процессов в пуле; 0 - создавать в этом процессе.',
+        )
+
+    def handle(self, *args, **options):
+        # Post, а не values_list: sorl берёт хранилище у FieldFile.
+        posts = Post.objects.exclude(image='').order_by('pk').only(
+            'image'
+        ).iterator()
+        workers = options['workers']
+        executor = make_executor(workers) if workers else None
+        build = executor.map if executor else map
+        ready = built = failed = 0
+        # Изображения, варианты которых созданы этим запуском: посты
+        # с тем же файлом тоже нужно обновить.
+        built_images = set()
+        try:
+            while True:
+                batch = list(islice(posts, options['batch_size']))
+                if not batch:
+                    break
+                shared = [post.pk for post in batch
+                          if post.image.name in built_images]
+                missing = [post for post in batch
+                           if post.image.name not in built_images
+                           and ready_variants(post.image) is None]
+                ready += len(batch) - len(shared) - len(missing)
+                done = [post for post, ok in zip(missing, build(
+                    thumbnail_worker.build, [post.pk for post in missing]
+                )) if ok]
+                built_images.update(post.image.name for post in done)
+                # Одно обновление лент на пачку, а не на каждый пост.
+                refresh(*shared, *(post.pk for post in done))
+                built += len(shared) + len(done)
+                failed += len(missing) - len(done)
+        finally:
+            if executor:
+                executor.shutdown()
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано: {built}, уже были готовы: {ready}, ошибок: {failed}'
+        ))
@@ -0,0 +1,55 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from posts.feeds import follow_feed_page
+
+User = get_user_model()
+
+ENGINES = ('join', 'timeline', 'merge')
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает движки ленты подписок на данных пользователя.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+        parser.add_argument('--pages', type=int, default=5,
+                            help='Сколько страниц пройти по курсорам.')
+        parser.add_argument('--repeat', type=int, default=10)
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(f'Пользователь {options["username"]} '
+                               f'не найден')
+        factory = RequestFactory()
+        self.stdout.write(f'{"engine":<10}{"ms/page":>10}{"queries":>10}')
+        for engine in ENGINES:
+            with override_settings(FOLLOW_FEED_ENGINE=engine,
+                                   POSTS_PAGINATION='cursor'):
+                elapsed, queries, pages = 0.0, 0, 0
+                for _ in range(options['repeat']):
+                    cursor = ''
+                    for _ in range(options['pages']):
+                        request = factory.get('/follow/', {'cursor': cursor})
+                        request.user = user
+                        with CaptureQueriesContext(connection) as context:
+                            started = time.perf_counter()
+                            page = follow_feed_page(request)
+                            list(page)
+                            elapsed += time.perf_counter() - started
+                        queries += len(context)
+                        pages += 1
+                        if not page.has_next():
+                            break
+                        cursor = page.next_cursor
+            self.stdout.write(
+                f'{engine:<10}{elapsed * 1000 / pages:>10.2f}'
+                f'{queries / pages:>10.1f}'
+            )
@@ -0,0 +1,31 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts import recommendations
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает рекомендации «Кого читать» для пользователей, '
+            'подписки которых менялись (--full - для всех).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true',
+                            help='Пересчитать всех по всему графу.')
+        parser.add_argument('--batch-size', type=int,
+                            default=settings.SUGGESTIONS_BATCH_SIZE)
+        parser.add_argument('--top-k', type=int,
+                            default=settings.SUGGESTIONS_TOP_K)
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        users = recommendations.refresh(full=options['full'],
+                                        batch_size=options['batch_size'],
+                                        top_k=options['top_k'])
+        engine = ('scipy' if recommendations.sparse is not None
+                  else 'python')
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересчитано пользователей: {users} '
+            f'за {time.monotonic() - started:.1f} с ({engine})'
+        ))
@@ -0,0 +1,36 @@
+import os
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.importer import READERS, PostImporter
+
+
+class Command(BaseCommand):
+    help = ('Потоково загружает группы, посты, комментарии и подписки '
+            'из JSONL или CSV (по записи на строку, тип в поле type).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл или - для stdin.')
+        parser.add_argument('--format', choices=READERS,
+                            help='По умолчанию - по расширению файла.')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or os.path.splitext(path)[1][1:]
+        if file_format not in READERS:
+            raise CommandError('Укажите --format jsonl или csv')
+        importer = PostImporter(batch_size=options['batch_size'],
+                                log=self.stderr.write)
+        if path == '-':
+            importer.run(READERS[file_format](sys.stdin))
+        else:
+            with open(path, encoding='utf-8', newline='') as stream:
+                importer.run(READERS[file_format](stream))
+        counts = ', '.join(f'{kind}: {count}'
+                           for kind, count in importer.counts.items())
+        self.stdout.write(self.style.SUCCESS(
+            f'{importer.progress()} за {importer.elapsed():.1f} с '
+            f'({counts}; пропущено: {importer.skipped})'
+        ))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from posts.instrumentation import profiling_token
+
+
+class Command(BaseCommand):
+    help = ('Выдаёт токен для заголовка X-Profile, включающего '
+            'профилирование запроса.')
+
+    def handle(self, *args, **options):
+        self.stdout.write(profiling_token())
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from posts.counters import repair
+from posts.models import Comment, Follow, Post, UserStats
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает счётчики комментариев, постов и подписок '
+            'и исправляет расходящиеся.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        posts, users = repair(Post, Comment, Follow, UserStats,
+                              batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Исправлено постов: {posts}, пользователей: {users}'
+        ))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from posts import instrumentation
+from posts.page_cache import page_cache_stats
+
+
+class Command(BaseCommand):
+    help = ('Выводит сводку RequestStatsMiddleware по всем процессам, '
+            'выложившим её в общий кеш.')
+
+    def handle(self, *args, **options):
+        header = (f'{"view":<24}{"count":>8}{"sql":>8}{"db ms":>10}'
+                  f'{"tpl ms":>10}{"wall ms":>10}{"max ms":>10}')
+        self.stdout.write(header)
+        for row in instrumentation.collect():
+            self.stdout.write(
+                f'{row["view"]:<24}{row["count"]:>8}{row["queries"]:>8.1f}'
+                f'{row["db_time"]:>10.2f}{row["render_time"]:>10.2f}'
+                f'{row["wall_time"]:>10.2f}{row["wall_time_max"]:>10.2f}'
+            )
+        page_cache = page_cache_stats()
+        self.stdout.write(
+            f'page cache: {page_cache["hits"]} hits, '
+            f'{page_cache["misses"]} misses, '
+            f'hit ratio {page_cache["hit_ratio"]:.2f}'
+        )
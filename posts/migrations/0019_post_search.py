@@ -0,0 +1,66 @@
+# Generated by Django 2.2.6 on 2026-10-18 06:12
+
+from django.db import migrations
+
+GROUP_TITLE = (
+    "COALESCE((SELECT title FROM posts_group WHERE id = new.group_id), '')"
+)
+
+CREATE_SEARCH = [
+    """
+    CREATE VIRTUAL TABLE posts_post_search USING fts5(
+        text, group_title, tokenize = 'unicode61 remove_diacritics 2'
+    )
+    """,
+    f"""
+    CREATE TRIGGER posts_post_search_insert AFTER INSERT ON posts_post BEGIN
+        INSERT INTO posts_post_search (rowid, text, group_title)
+        VALUES (new.id, new.text, {GROUP_TITLE});
+    END
+    """,
+    f"""
+    CREATE TRIGGER posts_post_search_update
+    AFTER UPDATE OF text, group_id ON posts_post BEGIN
+        UPDATE posts_post_search
+        SET text = new.text, group_title = {GROUP_TITLE}
+        WHERE rowid = old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER posts_post_search_delete AFTER DELETE ON posts_post BEGIN
+        DELETE FROM posts_post_search WHERE rowid = old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER posts_group_search_update
+    AFTER UPDATE OF title ON posts_group BEGIN
+        UPDATE posts_post_search SET group_title = new.title
+        WHERE rowid IN (SELECT id FROM posts_post WHERE group_id = new.id);
+    END
+    """,
+    """
+    INSERT INTO posts_post_search (rowid, text, group_title)
+    SELECT post.id, post.text, COALESCE(grp.title, '')
+    FROM posts_post AS post
+    LEFT JOIN posts_group AS grp ON grp.id = post.group_id
+    """,
+]
+
+DROP_SEARCH = [
+    'DROP TRIGGER IF EXISTS posts_group_search_update',
+    'DROP TRIGGER IF EXISTS posts_post_search_delete',
+    'DROP TRIGGER IF EXISTS posts_post_search_update',
+    'DROP TRIGGER IF EXISTS posts_post_search_insert',
+    'DROP TABLE IF EXISTS posts_post_search',
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0018_suggestions'),
+    ]
+
+    operations = [
+        migrations.RunSQL(CREATE_SEARCH, DROP_SEARCH),
+    ]
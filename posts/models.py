@@ -1,15 +1,32 @@
+import posixpath
+
 from django.contrib.auth import get_user_model
-from django.db import models
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, models, transaction
+from sorl import thumbnail
 
 User = get_user_model()
 
 
+class PostQuerySet(models.QuerySet):
+    def for_listing(self):
+        """Посты со всем, что выводит карточка поста, одним запросом."""
+        return self.select_related('author', 'group')
+
+
+class CommentManager(models.Manager):
+    def for_listing(self):
+        """Комментарии вместе с авторами."""
+        return self.get_queryset().select_related('author')
+
+
 class Post(models.Model):
     text = models.TextField(
         'Текст публикации',
         help_text='Здесь Вы можете рассказать, что у Вас нового.'
     )
     pub_date = models.DateTimeField('Дата публикации', auto_now_add=True)
+    updated = models.DateTimeField('Дата изменения', auto_now=True)
     author = models.ForeignKey(User, on_delete=models.CASCADE,
                                related_name='posts')
     group = models.ForeignKey(
@@ -29,9 +46,20 @@ class Post(models.Model):
         null=True,
         help_text='Загрузите картинку'
     )
+    comments_count = models.PositiveIntegerField(default=0, editable=False)
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         ordering = ['-pub_date']
+        indexes = [
+            models.Index(fields=['-pub_date', '-id'],
+                         name='post_date_idx'),
+            models.Index(fields=['author', '-pub_date', '-id'],
+                         name='post_author_date_id_idx'),
+            models.Index(fields=['group', '-pub_date', '-id'],
+                         name='post_group_date_idx'),
+        ]
 
     def __str__(self):
         return self.text[:15]
@@ -57,8 +85,14 @@ class Comment(models.Model):
     post = models.ForeignKey('Post', on_delete=models.CASCADE,
                              related_name='comments')
 
+    objects = CommentManager()
+
     class Meta:
         ordering = ['-created']
+        indexes = [
+            models.Index(fields=['post', '-created'],
+                         name='comment_post_created_idx'),
+        ]
 
     def __str__(self):
         return self.text[:15]
@@ -77,3 +111,186 @@ class Follow(models.Model):
                 name='unique_follow'
             )
         ]
+        indexes = [
+            models.Index(fields=['author', 'user'],
+                         name='follow_author_user_idx'),
+        ]
+
+    @classmethod
+    def add(cls, user_id, author_id):
+        """Подписка одним INSERT; повтор отсекает unique_follow.
+
+        True, если подписка появилась.
+        """
+        if user_id == author_id:
+            return False
+        try:
+            with transaction.atomic():
+                cls.objects.create(user_id=user_id, author_id=author_id)
+        except IntegrityError:
+            return False
+        return True
+
+    @classmethod
+    def remove(cls, user_id, author_id):
+        """Отписка; True, если подписка была.
+
+        QuerySet.delete() выбирает строки перед DELETE, чтобы отправить
+        post_delete (счётчики, лента) с настоящими экземплярами.
+        """
+        deleted, _ = cls.objects.filter(
+            user_id=user_id, author_id=author_id
+        ).delete()
+        return bool(deleted)
+
+
+class UserStats(models.Model):
+    user = models.OneToOneField(User, on_delete=models.CASCADE,
+                                primary_key=True, related_name='stats')
+    posts_count = models.PositiveIntegerField(default=0)
+    followers_count = models.PositiveIntegerField(default=0)
+    following_count = models.PositiveIntegerField(default=0)
+
+    @classmethod
+    def for_user(cls, user):
+        stats = cls.objects.filter(user=user).first()
+        if stats is None:
+            stats = cls.recount(user.pk)
+        return stats
+
+    @classmethod
+    def for_users(cls, user_ids):
+        """{user_id: UserStats} одним запросом, если все строки есть."""
+        stats = cls.objects.in_bulk(user_ids)
+        for user_id in set(user_ids) - set(stats):
+            stats[user_id] = cls.recount(user_id)
+        return stats
+
+    @classmethod
+    def recount(cls, user_id):
+        stats, _ = cls.objects.update_or_create(
+            user_id=user_id,
+            defaults={
+                'posts_count': Post.objects.filter(author_id=user_id).count(),
+                'followers_count': Follow.objects.filter(
+                    author_id=user_id
+                ).count(),
+                'following_count': Follow.objects.filter(
+                    user_id=user_id
+                ).count(),
+            }
+        )
+        return stats
+
+    @classmethod
+    def change(cls, user_id, field, delta):
+        stats = cls.objects.filter(user_id=user_id)
+        value = {field: models.F(field) + delta}
+        if delta < 0:
+            stats.filter(**{f'{field}__gte': -delta}).update(**value)
+        elif not stats.update(**value):
+            cls.recount(user_id)
+
+
+class TimelineEntry(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE,
+                             related_name='timeline')
+    post = models.ForeignKey(Post, on_delete=models.CASCADE,
+                             related_name='timeline_entries')
+    author = models.ForeignKey(User, on_delete=models.CASCADE,
+                               related_name='+')
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        ordering = ['-pub_date']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'],
+                name='unique_timeline_entry'
+            )
+        ]
+        indexes = [
+            models.Index(fields=['user', '-pub_date'],
+                         name='timeline_user_date_idx'),
+        ]
+
+
+class Suggestion(models.Model):
+    """Кого читать: автор и число подписок пользователя, читающих его.
+
+    Пересчитывается пачками командой build_suggestions
+    (posts.recommendations).
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE,
+                             related_name='suggestions')
+    author = models.ForeignKey(User, on_delete=models.CASCADE,
+                               related_name='+')
+    score = models.PositiveIntegerField()
+
+    class Meta:
+        ordering = ['-score', 'author']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'author'],
+                name='unique_suggestion'
+            )
+        ]
+        indexes = [
+            models.Index(fields=['user', '-score', 'author'],
+                         name='suggestion_user_score_idx'),
+        ]
+
+
+class StaleSuggestions(models.Model):
+    """Пользователь, подписки которого менялись после расчёта Suggestion."""
+    user = models.OneToOneField(User, on_delete=models.CASCADE,
+                                primary_key=True, related_name='+')
+    marked = models.DateTimeField()
+
+
+class StoredImage(models.Model):
+    """Число постов, ссылающихся на файл ContentAddressedStorage."""
+    name = models.CharField(max_length=100, primary_key=True)
+    references = models.PositiveIntegerField(default=0)
+
+    @classmethod
+    def acquire(cls, name, content=None):
+        """Плюс ссылка на файл name, загруженный из content.
+
+        Новая строка значит, что delete_unused мог удалить файл уже после
+        того, как хранилище приняло загрузку за дубликат: тогда файл
+        записывается заново.
+        """
+        images = cls.objects.filter(name=name)
+        value = {'references': models.F('references') + 1}
+        if not images.update(**value):
+            _, created = cls.objects.get_or_create(
+                name=name, defaults={'references': 1}
+            )
+            if not created:
+                images.update(**value)
+            elif content is not None and not default_storage.exists(name):
+                # posts/ab/ab12...ef.jpg сохраняется как posts/ab12...ef.jpg:
+                # подкаталог по хешу хранилище добавит само.
+                directory, filename = posixpath.split(name)
+                default_storage.save(
+                    posixpath.join(posixpath.dirname(directory), filename),
+                    content,
+                )
+
+    @classmethod
+    def release(cls, name):
+        """Минус ссылка; файл без ссылок удаляется после коммита."""
+        if cls.objects.filter(name=name, references__gt=0).update(
+                references=models.F('references') - 1):
+            transaction.on_commit(lambda: cls.delete_unused(name))
+
+    @classmethod
+    def delete_unused(cls, name):
+        # Пока ждали коммита, файл могли загрузить снова. Файл удаляется
+        # до коммита: acquire() ждёт блокировку строки и увидит, что его
+        # больше нет.
+        with transaction.atomic():
+            deleted, _ = cls.objects.filter(name=name, references=0).delete()
+            if deleted:
+                thumbnail.delete(name)
@@ -0,0 +1,187 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.http import Http404
+from django.shortcuts import get_object_or_404
+
+from .bloom import SharedNameFilter
+from .models import Group, Post
+
+User = get_user_model()
+
+# Значение в кеше для объекта, которого нет в БД.
+MISSING = 'object_cache:missing'
+# Поля User, которые видят страницы: хеш пароля и прочее в общий кеш
+# не попадают, при обращении к ним Django дочитает их из БД.
+USER_FIELDS = ('id', 'username', 'first_name', 'last_name')
+AUTHOR_DEFERRED = [f'author__{field.name}'
+                   for field in User._meta.concrete_fields
+                   if field.name not in USER_FIELDS]
+# Для пользователя сессии нужны ещё флаги доступа; вместо хеша пароля
+# кешируется производный от него хеш сессии.
+SESSION_USER_FIELDS = USER_FIELDS + (
+    'email', 'is_active', 'is_staff', 'is_superuser', 'last_login',
+)
+
+
+class LocalLRU:
+    """Небольшой кеш процесса перед общим кешем.
+
+    Записи живут OBJECT_CACHE_LOCAL_TTL секунд: сброс из другого процесса
+    доходит сюда не позже, чем через это время.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._items = OrderedDict()
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            value, expires = item
+            if expires <= time.monotonic():
+                del self._items[key]
+                return None
+            self._items.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._items[key] = (
+                value, time.monotonic() + settings.OBJECT_CACHE_LOCAL_TTL
+            )
+            self._items.move_to_end(key)
+            while len(self._items) > settings.OBJECT_CACHE_LOCAL_SIZE:
+                self._items.popitem(last=False)
+
+    def delete_many(self, keys):
+        with self._lock:
+            for key in keys:
+                self._items.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+
+local = LocalLRU()
+usernames = SharedNameFilter(
+    'usernames', lambda: User.objects.values_list('username', flat=True)
+)
+group_slugs = SharedNameFilter(
+    'group_slugs', lambda: Group.objects.values_list('slug', flat=True)
+)
+
+
+def _key(name, lookup):
+    return f'object:{name}:{lookup}'
+
+
+def _fetch(name, lookup, load, names=None):
+    """Объект из кеша процесса, общего кеша или БД (load).
+
+    Имена, которых нет в фильтре Блума names, отклоняются без запросов
+    к БД; отсутствие объекта кешируется на NEGATIVE_CACHE_TTL секунд.
+    Возвращается копия: объект в LRU общий для запросов и потоков.
+    """
+    key = _key(name, lookup)
+    obj = local.get(key)
+    if obj is None:
+        if names is not None and str(lookup) not in names:
+            raise Http404
+        obj = cache.get(key)
+        if obj == MISSING:
+            raise Http404
+        if obj is None:
+            try:
+                obj = load()
+            except Http404:
+                cache.set(key, MISSING, settings.NEGATIVE_CACHE_TTL)
+                raise
+            cache.set(key, obj, settings.OBJECT_CACHE_TTL)
+        local.set(key, obj)
+    return copy.deepcopy(obj)
+
+
+def _delete(keys):
+    local.delete_many(keys)
+    cache.delete_many(keys)
+
+
+def forget(name, *lookups):
+    """Сбрасывает объекты сразу и ещё раз после коммита.
+
+    Между этими моментами параллельный запрос мог прочитать из БД
+    незакоммиченное ещё старое состояние и положить его в кеш.
+    """
+    keys = [_key(name, lookup) for lookup in lookups]
+    if not keys:
+        return
+    _delete(keys)
+    transaction.on_commit(lambda: _delete(keys))
+
+
+def get_user(username):
+    """Как get_object_or_404(User, username=...), но из кеша.
+
+    Загружаются только USER_FIELDS.
+    """
+    return _fetch('user', username, lambda: get_object_or_404(
+        User.objects.only(*USER_FIELDS), username=username
+    ), usernames)
+
+
+def _load_session_user(user_id):
+    user = get_object_or_404(User.objects.only(
+        *SESSION_USER_FIELDS, 'password'
+    ), pk=user_id)
+    user.session_auth_hash = user.get_session_auth_hash()
+    # Без значения в __dict__ поле становится отложенным, как после only().
+    del user.password
+    return user
+
+
+def get_user_by_id(user_id):
+    """Пользователь сессии или None.
+
+    Хеш сессии берётся из кеша, пока пароль не загружен или не задан
+    заново (set_password перед update_session_auth_hash).
+    """
+    try:
+        user = _fetch('user_id', user_id,
+                      lambda: _load_session_user(user_id))
+    except Http404:
+        return None
+
+    def get_session_auth_hash():
+        if 'password' in user.__dict__:
+            return type(user).get_session_auth_hash(user)
+        return user.session_auth_hash
+    user.get_session_auth_hash = get_session_auth_hash
+    return user
+
+
+def get_group(slug):
+    return _fetch('group', slug,
+                  lambda: get_object_or_404(Group, slug=slug), group_slugs)
+
+
+def get_post(username, post_id):
+    """Пост с автором и группой, если его автор - username."""
+    if username not in usernames:
+        raise Http404
+    post = _fetch('post', post_id, lambda: get_object_or_404(
+        Post.objects.for_listing().defer(*AUTHOR_DEFERRED), pk=post_id
+    ))
+    if post.author.username != username:
+        return get_object_or_404(Post.objects.for_listing(), pk=post_id,
+                                 author__username=username)
+    return post
@@ -0,0 +1,141 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
+
+from .conditional import conditional_response
+
+SURROGATE_KEY_HEADER = 'Surrogate-Key'
+STATS_KEYS = ('page_cache:hits', 'page_cache:misses')
+# Растёт с каждым purge(): страница, во время отрисовки которой был
+# сброс, не сохраняется.
+PURGES_KEY = 'page_cache:purges'
+
+
+def _tag_key(tag):
+    return f'page_cache:tag:{tag}'
+
+
+def _page_key(request):
+    digest = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    return f'page_cache:page:{digest}'
+
+
+def _incr(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 0, None)
+        cache.incr(key)
+
+
+def tag_response(response, *tags):
+    """Помечает ответ суррогатными ключами: post:1, author:2, group:3..."""
+    response[SURROGATE_KEY_HEADER] = ' '.join(str(tag) for tag in tags)
+    return response
+
+
+def purge(*tags):
+    """Сбрасывает все страницы, помеченные любым из ключей.
+
+    None пропускается, чтобы можно было передавать group_tag() поста
+    без группы. Сброс выполняется после коммита: иначе параллельный
+    запрос закешировал бы страницу без изменений под новой версией.
+    """
+    tags = [tag for tag in tags if tag is not None]
+    if tags:
+        transaction.on_commit(lambda: _purge_now(tags))
+
+
+def _purge_now(tags):
+    for tag in tags:
+        _incr(_tag_key(tag))
+    _incr(PURGES_KEY)
+
+
+def group_tag(group_id):
+    return f'group:{group_id}' if group_id is not None else None
+
+
+def post_tags(posts):
+    return [f'post:{post.pk}' for post in posts]
+
+
+def page_cache_stats():
+    hits, misses = (cache.get(key, 0) for key in STATS_KEYS)
+    total = hits + misses
+    return {'hits': hits, 'misses': misses,
+            'hit_ratio': hits / total if total else 0.0}
+
+
+class AnonymousPageCacheMiddleware:
+    """Кеширует целиком ответы анонимным GET-запросам к лентам и постам.
+
+    Запись хранит версии своих суррогатных ключей; purge() увеличивает
+    версию ключа, и запись с устаревшей версией считается промахом.
+    Ключи страницы известны только после отрисовки, поэтому до вызова
+    view запоминается счётчик сбросов: если он изменился, версии могли
+    вырасти уже после того, как view прочитала данные, и ответ
+    не сохраняется.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def cacheable(self, request):
+        match = request.resolver_match
+        return (settings.PAGE_CACHE_ENABLED
+                and request.method in ('GET', 'HEAD')
+                and match is not None
+                and match.url_name in settings.PAGE_CACHE_VIEWS
+                and not request.user.is_authenticated)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if not self.cacheable(request):
+            return None
+        request.page_cache_lookup = True
+        entry = cache.get(_page_key(request))
+        if entry is not None:
+            versions = cache.get_many(list(entry['tags']))
+            if all(versions.get(key, 0) == version
+                   for key, version in entry['tags'].items()):
+                _incr(STATS_KEYS[0])
+                response = HttpResponse(entry['content'],
+                                        status=entry['status'])
+                for header, value in entry['headers']:
+                    response[header] = value
+                response = conditional_response(request, response)
+                response['X-Page-Cache'] = 'HIT'
+                return response
+        _incr(STATS_KEYS[1])
+        request.page_cache_purges = cache.get(PURGES_KEY, 0)
+        return None
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if (getattr(request, 'page_cache_lookup', False)
+                and response.get('X-Page-Cache') != 'HIT'):
+            self.store(request, response)
+        return response
+
+    def store(self, request, response):
+        response['X-Page-Cache'] = 'MISS'
+        if (response.status_code != 200 or response.streaming
+                or response.cookies
+                or SURROGATE_KEY_HEADER not in response):
+            return
+        tags = [_tag_key(tag)
+                for tag in response[SURROGATE_KEY_HEADER].split()]
+        versions = cache.get_many(tags + [PURGES_KEY])
+        if versions.get(PURGES_KEY, 0) != request.page_cache_purges:
+            return
+        cache.set(_page_key(request), {
+            'content': response.content,
+            'status': response.status_code,
+            'headers': [(header, value)
+                        for header, value in response.items()
+                        if header != 'X-Page-Cache'],
+            'tags': {tag: versions.get(tag, 0) for tag in tags},
+        }, settings.PAGE_CACHE_TTL)
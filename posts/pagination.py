@@ -0,0 +1,128 @@
+import binascii
+from datetime import datetime
+
+from django.conf import settings
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+from django.utils.encoding import force_str
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+
+NEXT = 'n'
+PREVIOUS = 'p'
+
+
+def encode_cursor(direction, obj):
+    """Упаковывает ключ (pub_date, id) объекта в непрозрачный токен."""
+    raw = f'{direction}|{obj.pub_date.isoformat()}|{obj.pk}'
+    return urlsafe_base64_encode(raw.encode())
+
+
+def decode_cursor(token):
+    """Возвращает (direction, pub_date, id) или None для битого токена."""
+    try:
+        direction, pub_date, pk = force_str(
+            urlsafe_base64_decode(token)
+        ).split('|')
+        if direction not in (NEXT, PREVIOUS):
+            return None
+        return direction, datetime.fromisoformat(pub_date), int(pk)
+    except (binascii.Error, TypeError, ValueError, UnicodeDecodeError):
+        return None
+
+
+def keyset_q(direction, key):
+    """Условие «строго за курсором» для обхода в направлении direction.
+
+    Записано через нестрогое сравнение и исключение, а не через OR,
+    чтобы SQLite читал индекс (pub_date, id) диапазоном в нужном порядке.
+    """
+    if key is None:
+        return Q()
+    pub_date, pk = key
+    if direction == NEXT:
+        return Q(pub_date__lte=pub_date) & ~Q(pub_date=pub_date, pk__gte=pk)
+    return Q(pub_date__gte=pub_date) & ~Q(pub_date=pub_date, pk__lte=pk)
+
+
+def keyset_order(direction):
+    if direction == NEXT:
+        return ('-pub_date', '-pk')
+    return ('pub_date', 'pk')
+
+
+class CursorPage(Page):
+    is_cursor = True
+
+    def __init__(self, object_list, paginator, cursor,
+                 next_cursor=None, previous_cursor=None):
+        super().__init__(object_list, 1, paginator)
+        self.cursor = cursor
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return f'<Page {self.cursor or "first"}>'
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    def next_page_number(self):
+        return self.next_cursor
+
+    def previous_page_number(self):
+        return self.previous_cursor
+
+
+class CursorPaginator(Paginator):
+    """Keyset-пагинация по (pub_date, id) без OFFSET и COUNT(*)."""
+
+    def encode(self, direction, obj):
+        return encode_cursor(direction, obj)
+
+    def decode(self, token):
+        return decode_cursor(token)
+
+    def fetch(self, direction, key, limit):
+        """До limit объектов за ключом key в порядке обхода direction."""
+        return list(
+            self.object_list.filter(keyset_q(direction, key)).order_by(
+                *keyset_order(direction)
+            )[:limit]
+        )
+
+    def get_page(self, cursor):
+        decoded = self.decode(cursor) if cursor else None
+        if decoded is None:
+            cursor, direction, key = None, NEXT, None
+        else:
+            direction, key = decoded[0], decoded[1:]
+        rows = self.fetch(direction, key, self.per_page + 1)
+        has_extra = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if direction == NEXT:
+            has_more, has_before = has_extra, key is not None
+        else:
+            rows.reverse()
+            has_more, has_before = True, has_extra
+        next_cursor = previous_cursor = None
+        if rows and has_more:
+            next_cursor = self.encode(NEXT, rows[-1])
+        if rows and has_before:
+            previous_cursor = self.encode(PREVIOUS, rows[0])
+        return CursorPage(rows, self, cursor, next_cursor, previous_cursor)
+
+
+def paginate(request, object_list):
+    """Страница ленты: курсорная или классическая (?page=N)."""
+    per_page = settings.POSTS_PER_PAGE
+    cursor = request.GET.get('cursor')
+    if 'page' not in request.GET and (
+            cursor or settings.POSTS_PAGINATION == 'cursor'):
+        return CursorPaginator(object_list, per_page).get_page(cursor)
+    return Paginator(object_list, per_page).get_page(request.GET.get('page'))
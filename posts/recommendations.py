@@ -0,0 +1,214 @@
+import heapq
+from array import array
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Follow, StaleSuggestions, Suggestion
+
+try:
+    import numpy as np
+    from scipy import sparse
+except ImportError:
+    np = sparse = None
+
+# Сколько id передавать в один IN (...): у SQLite лимит в 999 параметров.
+ID_CHUNK = 500
+
+
+def _chunks(items, size):
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def mark_stale(*user_ids):
+    """Подписки пользователей изменились: пересчитать их и их подписчиков.
+
+    Время отметки обновляется, чтобы идущий сейчас расчёт её не снял.
+    """
+    now = timezone.now()
+    for chunk in _chunks(set(user_ids), ID_CHUNK):
+        StaleSuggestions.objects.filter(user_id__in=chunk).update(marked=now)
+        StaleSuggestions.objects.bulk_create(
+            [StaleSuggestions(user_id=user_id, marked=now)
+             for user_id in chunk],
+            ignore_conflicts=True,
+        )
+
+
+def load_edges(user_ids=None):
+    """Рёбра Follow двумя массивами int64: подписчики и авторы.
+
+    Для user_ids - только то, что нужно их рекомендациям: их подписки
+    и подписки авторов, которых они читают.
+    """
+    users, authors = array('q'), array('q')
+
+    def add(follows):
+        for user_id, author_id in follows.values_list(
+                'user_id', 'author_id').order_by().iterator():
+            users.append(user_id)
+            authors.append(author_id)
+
+    if user_ids is None:
+        add(Follow.objects.all())
+        return users, authors
+    for chunk in _chunks(user_ids, ID_CHUNK):
+        add(Follow.objects.filter(user_id__in=chunk))
+    second_hop = set(authors) - set(user_ids)
+    for chunk in _chunks(second_hop, ID_CHUNK):
+        add(Follow.objects.filter(user_id__in=chunk))
+    return users, authors
+
+
+def _top(candidates, k):
+    """k лучших (author_id, score): по убыванию score, затем по id."""
+    return heapq.nsmallest(k, candidates, key=lambda item: (-item[1], item[0]))
+
+
+class PythonScorer:
+    """Оценки на множествах Python: если numpy и scipy не установлены."""
+
+    def __init__(self, users, authors):
+        self.following = defaultdict(set)
+        for user_id, author_id in zip(users, authors):
+            self.following[user_id].add(author_id)
+
+    def top(self, user_ids, k):
+        result = {}
+        for user_id in user_ids:
+            followed = self.following.get(user_id, set())
+            scores = Counter()
+            for author_id in followed:
+                scores.update(self.following.get(author_id, ()))
+            result[user_id] = _top(
+                ((author_id, score) for author_id, score in scores.items()
+                 if author_id != user_id and author_id not in followed), k
+            )
+        return result
+
+
+class SparseScorer:
+    """Оценки умножением разреженных матриц: F[пачка] @ F.
+
+    F - матрица пользователь × автор из единиц (CSR), id пользователей
+    сжаты в номера строк через np.unique.
+    """
+
+    def __init__(self, users, authors):
+        users = np.frombuffer(users, dtype=np.int64)
+        authors = np.frombuffer(authors, dtype=np.int64)
+        self.ids = np.unique(np.concatenate([users, authors]))
+        size = len(self.ids)
+        self.follows = sparse.csr_matrix(
+            (np.ones(len(users), dtype=np.float32),
+             (np.searchsorted(self.ids, users),
+              np.searchsorted(self.ids, authors))),
+            shape=(size, size),
+        )
+
+    def top(self, user_ids, k):
+        result = {user_id: [] for user_id in user_ids}
+        user_ids = np.asarray(user_ids, dtype=np.int64)
+        index = np.searchsorted(self.ids, user_ids)
+        known = index < len(self.ids)
+        known[known] = self.ids[index[known]] == user_ids[known]
+        rows = index[known]
+        if not len(rows):
+            return result
+        block = self.follows[rows]
+        scores = block @ self.follows
+        # Уже прочитанных авторов и самого пользователя не советуем.
+        own = sparse.csr_matrix(
+            (np.ones(len(rows), dtype=np.float32),
+             (np.arange(len(rows)), rows)),
+            shape=scores.shape,
+        )
+        scores = (scores - scores.multiply(block)
+                  - scores.multiply(own)).tocsr()
+        scores.eliminate_zeros()
+        for row, user_id in enumerate(user_ids[known].tolist()):
+            start, end = scores.indptr[row], scores.indptr[row + 1]
+            authors = self.ids[scores.indices[start:end]]
+            values = scores.data[start:end]
+            order = np.lexsort((authors, -values))[:k]
+            result[user_id] = list(zip(authors[order].tolist(),
+                                       values[order].astype(int).tolist()))
+        return result
+
+
+def make_scorer(users, authors):
+    if sparse is None:
+        return PythonScorer(users, authors)
+    return SparseScorer(users, authors)
+
+
+def followers_of(author_ids):
+    followers = set()
+    for chunk in _chunks(author_ids, ID_CHUNK):
+        followers.update(Follow.objects.filter(
+            author_id__in=chunk
+        ).values_list('user_id', flat=True))
+    return followers
+
+
+def save(top):
+    """Заменяет рекомендации пользователей пачки одной транзакцией."""
+    with transaction.atomic():
+        for chunk in _chunks(top, ID_CHUNK):
+            Suggestion.objects.filter(user_id__in=chunk).delete()
+        Suggestion.objects.bulk_create(
+            [Suggestion(user_id=user_id, author_id=author_id, score=score)
+             for user_id, suggestions in top.items()
+             for author_id, score in suggestions],
+            batch_size=ID_CHUNK,
+        )
+
+
+def refresh(full=False, batch_size=None, top_k=None):
+    """Пересчитывает рекомендации; возвращает число пользователей.
+
+    Рекомендация автора - число авторов из подписок пользователя, которые
+    сами читают этого автора (друзья друзей). Без full пересчитываются
+    только пользователи из StaleSuggestions и их подписчики, и граф
+    читается только в пределах двух шагов от них.
+    """
+    batch_size = batch_size or settings.SUGGESTIONS_BATCH_SIZE
+    top_k = top_k or settings.SUGGESTIONS_TOP_K
+    started = timezone.now()
+    stale = list(StaleSuggestions.objects.filter(
+        marked__lte=started
+    ).values_list('user_id', flat=True))
+    if full:
+        users = sorted(set(
+            Follow.objects.values_list('user_id', flat=True).distinct()
+        ) | set(stale))
+        scorer = make_scorer(*load_edges())
+    else:
+        users = sorted(set(stale) | followers_of(stale))
+        scorer = make_scorer(*load_edges(users))
+    for batch in _chunks(users, batch_size):
+        save(scorer.top(batch, top_k))
+    if full:
+        Suggestion.objects.exclude(
+            user_id__in=Follow.objects.values('user_id')
+        ).delete()
+    for chunk in _chunks(stale, ID_CHUNK):
+        StaleSuggestions.objects.filter(user_id__in=chunk,
+                                        marked__lte=started).delete()
+    return len(users)
+
+
+def suggestions_for(user):
+    """Рекомендации для показа одним запросом по индексу.
+
+    Авторы, на которых пользователь подписался после расчёта, отсеиваются.
+    """
+    if not user.is_authenticated:
+        return []
+    return list(Suggestion.objects.filter(user=user).exclude(
+        author__following__user=user
+    ).select_related('author')[:settings.SUGGESTIONS_SHOWN])
@@ -0,0 +1,124 @@
+import binascii
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.utils.encoding import force_str
+from django.utils.html import escape
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+from django.utils.safestring import mark_safe
+
+from .models import Post
+from .pagination import NEXT, PREVIOUS, CursorPaginator
+
+# Индекс posts_post_search (миграция 0019) синхронизируют триггеры SQLite,
+# поэтому он видит и bulk_create импорта, и QuerySet.update().
+TABLE = 'posts_post_search'
+# Совпадение в тексте весит больше, чем в названии группы.
+RANK = f'bm25({TABLE}, 1.0, 0.5)'
+# Границы совпадений в snippet(): символы из Private Use Area, чтобы
+# экранировать текст целиком и только потом превратить их в <mark>.
+MARK_START, MARK_END = '\ue000', '\ue001'
+SNIPPET = f"snippet({TABLE}, 0, '{MARK_START}', '{MARK_END}', '…', 32)"
+MAX_TERMS = 10
+
+
+def match_query(text):
+    """Запрос пользователя как выражение MATCH: все слова, по префиксу.
+
+    Синтаксис FTS5 (кавычки, OR, NEAR, column:) не пропускается: каждое
+    слово берётся в кавычки, иначе опечатка в запросе - ошибка SQLite.
+    """
+    terms = re.findall(r'\w+', text)[:MAX_TERMS]
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def filter_matching(queryset, query):
+    """Посты queryset, подходящие под выражение MATCH, одним подзапросом.
+
+    Через extra(): RawSQL в pk__in даёт IN ((SELECT ...)), и SQLite
+    сравнивает id только с первой строкой подзапроса.
+    """
+    return queryset.extra(
+        where=[f'"posts_post"."id" IN '
+               f'(SELECT rowid FROM {TABLE} WHERE {TABLE} MATCH %s)'],
+        params=[query],
+    )
+
+
+def highlight(snippet):
+    return mark_safe(
+        escape(snippet).replace(MARK_START, '<mark>')
+        .replace(MARK_END, '</mark>')
+    )
+
+
+class SearchPaginator(CursorPaginator):
+    """Keyset-пагинация по (bm25, id) результатов полнотекстового поиска.
+
+    object_list - выражение MATCH. Ранг и фрагмент с подсветкой считаются
+    только для строк страницы: внутренний запрос выбирает их rowid.
+    """
+
+    def encode(self, direction, post):
+        raw = f'{direction}|{post.search_rank!r}|{post.pk}'
+        return urlsafe_base64_encode(raw.encode())
+
+    def decode(self, token):
+        try:
+            direction, rank, pk = force_str(
+                urlsafe_base64_decode(token)
+            ).split('|')
+            if direction not in (NEXT, PREVIOUS):
+                return None
+            return direction, float(rank), int(pk)
+        except (binascii.Error, TypeError, ValueError, UnicodeDecodeError):
+            return None
+
+    def fetch(self, direction, key, limit):
+        # Меньший bm25 - лучшее совпадение; при равенстве новые посты выше.
+        if direction == NEXT:
+            after = f'{RANK} > %s OR ({RANK} = %s AND rowid < %s)'
+            sort = f'{RANK}, rowid DESC'
+        else:
+            after = f'{RANK} < %s OR ({RANK} = %s AND rowid > %s)'
+            sort = f'{RANK} DESC, rowid'
+        params = [self.object_list, self.object_list]
+        condition = ''
+        if key is not None:
+            rank, pk = key
+            condition = f'AND ({after})'
+            params += [rank, rank, pk]
+        params.append(limit)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid, {RANK}, {SNIPPET} FROM {TABLE} '
+                f'WHERE {TABLE} MATCH %s AND rowid IN ('
+                f'SELECT rowid FROM {TABLE} WHERE {TABLE} MATCH %s '
+                f'{condition} ORDER BY {sort} LIMIT %s'
+                f') ORDER BY {sort}',
+                params,
+            )
+            rows = cursor.fetchall()
+        posts = Post.objects.for_listing().in_bulk(
+            [pk for pk, _, _ in rows]
+        )
+        result = []
+        for pk, rank, snippet in rows:
+            # Пост мог быть удалён между запросами.
+            post = posts.get(pk)
+            if post is not None:
+                post.search_rank = rank
+                post.snippet = highlight(snippet)
+                result.append(post)
+        return result
+
+
+def search_page(request, text):
+    """Страница результатов для запроса text или None для пустого запроса."""
+    query = match_query(text)
+    if not query:
+        return None
+    return SearchPaginator(query, settings.POSTS_PER_PAGE).get_page(
+        request.GET.get('cursor')
+    )
@@ -0,0 +1,71 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.contrib.sessions.backends.cached_db import (
+    SessionStore as CachedDBStore,
+)
+
+KEY_PREFIX = 'posts.sessions'
+
+
+class SessionStore(CachedDBStore):
+    """Сессии из общего кеша, запись в БД только при изменении данных.
+
+    Любое изменение данных сразу пишется в БД: кеш может в любой момент
+    потерять запись (вытеснение, ранний промах XFetch), и load() тогда
+    читает сессию из БД. Сохранение без изменений (продление срока при
+    SESSION_SAVE_EVERY_REQUEST) идёт в БД не чаще раза
+    в SESSION_WRITE_BEHIND секунд, в остальное время - только в кеш.
+    """
+
+    cache_key_prefix = KEY_PREFIX
+
+    def __init__(self, session_key=None):
+        super().__init__(session_key)
+        self._db_saved = 0.0
+        self._db_digest = None
+
+    def _digest(self, data):
+        return hashlib.sha1(self.serializer().dumps(data)).hexdigest()
+
+    def _cache_session(self, data, expiry_age):
+        self._cache.set(self.cache_key, {
+            'data': data,
+            'db_saved': self._db_saved,
+            'db_digest': self._db_digest,
+        }, expiry_age)
+
+    def load(self):
+        try:
+            entry = self._cache.get(self.cache_key)
+        except Exception:
+            entry = None
+        if entry is not None:
+            self._db_saved = entry['db_saved']
+            self._db_digest = entry['db_digest']
+            return entry['data']
+        session = self._get_session_from_db()
+        if not session:
+            return {}
+        data = self.decode(session.session_data)
+        self._db_saved = time.time()
+        self._db_digest = self._digest(data)
+        self._cache_session(
+            data, self.get_expiry_age(expiry=session.expire_date)
+        )
+        return data
+
+    def save(self, must_create=False):
+        if self.session_key is None:
+            return self.create()
+        data = self._get_session(no_load=must_create)
+        now = time.time()
+        digest = self._digest(data)
+        if (must_create
+                or digest != self._db_digest
+                or now - self._db_saved >= settings.SESSION_WRITE_BEHIND):
+            super(CachedDBStore, self).save(must_create)
+            self._db_saved = now
+            self._db_digest = digest
+        self._cache_session(data, self.get_expiry_age())
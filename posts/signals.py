@@ -0,0 +1,215 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.signals import user_logged_out
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import (
+    post_delete, post_save, pre_delete, pre_save,
+)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import object_cache, recommendations, timeline
+from .caching import bump_feed_generation
+from .models import Comment, Follow, Group, Post, StoredImage, UserStats
+from .page_cache import group_tag, purge
+from .storage import content_addressed
+
+User = get_user_model()
+
+
+def _feed_changed():
+    """Фрагмент общей ленты устарел: новое поколение после коммита."""
+    transaction.on_commit(bump_feed_generation)
+
+
+@receiver(post_save, sender=Post)
+def post_created(sender, instance, created, **kwargs):
+    if created:
+        timeline.schedule_fan_out(instance)
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, **kwargs):
+    if created:
+        timeline.schedule_backfill(instance)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    timeline.prune(instance.user_id, instance.author_id)
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def follows_changed(sender, instance, **kwargs):
+    recommendations.mark_stale(instance.user_id)
+    purge(f'author:{instance.author_id}', f'author:{instance.user_id}')
+
+
+@receiver(post_save, sender=Post)
+def count_post_created(sender, instance, created, **kwargs):
+    if created:
+        UserStats.change(instance.author_id, 'posts_count', 1)
+
+
+@receiver(post_delete, sender=Post)
+def count_post_deleted(sender, instance, **kwargs):
+    UserStats.change(instance.author_id, 'posts_count', -1)
+
+
+@receiver(post_save, sender=Comment)
+def count_comment_created(sender, instance, created, **kwargs):
+    if created:
+        Post.objects.filter(pk=instance.post_id).update(
+            comments_count=F('comments_count') + 1,
+            updated=timezone.now()
+        )
+        object_cache.forget('post', instance.post_id)
+        purge('feed', f'post:{instance.post_id}')
+
+
+@receiver(post_delete, sender=Comment)
+def count_comment_deleted(sender, instance, **kwargs):
+    Post.objects.filter(pk=instance.post_id, comments_count__gt=0).update(
+        comments_count=F('comments_count') - 1,
+        updated=timezone.now()
+    )
+    object_cache.forget('post', instance.post_id)
+    purge('feed', f'post:{instance.post_id}')
+
+
+@receiver(post_save, sender=Follow)
+def count_follow_created(sender, instance, created, **kwargs):
+    if created:
+        UserStats.change(instance.author_id, 'followers_count', 1)
+        UserStats.change(instance.user_id, 'following_count', 1)
+
+
+@receiver(post_delete, sender=Follow)
+def count_follow_deleted(sender, instance, **kwargs):
+    UserStats.change(instance.author_id, 'followers_count', -1)
+    UserStats.change(instance.user_id, 'following_count', -1)
+
+
+def _renamed(instance, field, update_fields):
+    """Прежнее значение field, если сохранение instance его меняет."""
+    if instance.pk is None or (update_fields and field not in update_fields):
+        return None
+    old = type(instance).objects.filter(pk=instance.pk).values_list(
+        field, flat=True
+    ).first()
+    return old if old not in (None, getattr(instance, field)) else None
+
+
+@receiver(pre_save, sender=User)
+def forget_renamed_user(sender, instance, update_fields=None, **kwargs):
+    old_username = _renamed(instance, 'username', update_fields)
+    if old_username is not None:
+        _feed_changed()
+        object_cache.usernames.invalidate()
+        object_cache.forget('user', old_username)
+        post_ids = list(instance.posts.values_list('pk', flat=True))
+        object_cache.forget('post', *post_ids)
+        purge('feed', f'author:{instance.pk}',
+              *(f'post:{post_id}' for post_id in post_ids))
+
+
+@receiver(post_save, sender=User)
+def forget_user(sender, instance, created, **kwargs):
+    if created:
+        object_cache.usernames.add(instance.username)
+    object_cache.forget('user', instance.username)
+    object_cache.forget('user_id', instance.pk)
+
+
+@receiver(post_delete, sender=User)
+def forget_deleted_user(sender, instance, **kwargs):
+    object_cache.forget('user', instance.username)
+    object_cache.forget('user_id', instance.pk)
+
+
+@receiver(user_logged_out)
+def forget_logged_out_user(sender, request, user, **kwargs):
+    if user is not None:
+        object_cache.forget('user_id', user.pk)
+
+
+@receiver(pre_save, sender=Group)
+def forget_renamed_group(sender, instance, update_fields=None, **kwargs):
+    old_slug = _renamed(instance, 'slug', update_fields)
+    if old_slug is not None:
+        object_cache.group_slugs.invalidate()
+        object_cache.forget('group', old_slug)
+
+
+@receiver(post_save, sender=Group)
+def forget_group(sender, instance, created, **kwargs):
+    object_cache.forget('group', instance.slug)
+    if created:
+        object_cache.group_slugs.add(instance.slug)
+    else:
+        post_ids = list(instance.posts.values_list('pk', flat=True))
+        object_cache.forget('post', *post_ids)
+        purge('feed', group_tag(instance.pk),
+              *(f'post:{post_id}' for post_id in post_ids))
+
+
+@receiver(pre_delete, sender=Group)
+def purge_deleted_group(sender, instance, **kwargs):
+    # После удаления посты уже без группы: их id нужны до него.
+    purge('feed', group_tag(instance.pk), *(
+        f'post:{post_id}'
+        for post_id in instance.posts.values_list('pk', flat=True)
+    ))
+
+
+@receiver(post_delete, sender=Group)
+def forget_deleted_group(sender, instance, **kwargs):
+    object_cache.forget('group', instance.slug)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def feed_changed(sender, **kwargs):
+    _feed_changed()
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def forget_post(sender, instance, **kwargs):
+    object_cache.forget('post', instance.pk)
+    # Прежнюю группу поста сбрасывает post:<id>: её страница с ним
+    # помечена этим ключом.
+    purge('feed', f'post:{instance.pk}', f'author:{instance.author_id}',
+          group_tag(instance.group_id))
+
+
+@receiver(pre_save, sender=Post)
+def remember_replaced_image(sender, instance, update_fields=None, **kwargs):
+    instance._replaced_image = _renamed(instance, 'image', update_fields)
+    # Загрузку ещё можно прочитать, пока FileField.pre_save её не сохранил.
+    image = instance.image
+    instance._uploaded_image = (
+        image.file if image and not image._committed else None
+    )
+
+
+@receiver(post_save, sender=Post)
+def count_image_references(sender, instance, created, **kwargs):
+    replaced = getattr(instance, '_replaced_image', None)
+    if (created or replaced is not None) and content_addressed(
+            instance.image.name):
+        StoredImage.acquire(instance.image.name,
+                            getattr(instance, '_uploaded_image', None))
+    if content_addressed(replaced):
+        StoredImage.release(replaced)
+
+
+@receiver(post_delete, sender=Post)
+def release_deleted_image(sender, instance, **kwargs):
+    if content_addressed(instance.image.name):
+        StoredImage.release(instance.image.name)
@@ -0,0 +1,88 @@
+"""Всё, что posts.thumbnails берёт из внутренностей sorl-thumbnail.
+
+Схема имён миниатюр и записи kvstore cached_db не входят в публичный
+API sorl. Они собраны здесь и сверены с версией SORL_VERSION из
+requirements.txt; с другой версией manage.py check предупреждает
+posts.W001, и перед обновлением sorl этот модуль нужно сверить с её
+исходниками.
+"""
+import os
+from importlib import metadata
+
+from django.core import checks
+from sorl.thumbnail import default
+from sorl.thumbnail.base import EXTENSIONS
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.helpers import serialize, tokey
+from sorl.thumbnail.images import deserialize_image_file
+from sorl.thumbnail.kvstores import cached_db_kvstore
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+SORL_VERSION = '12.6.3'
+SOURCE_FORMATS = {'.jpg': 'JPEG', '.jpeg': 'JPEG', '.png': 'PNG',
+                  '.gif': 'GIF', '.webp': 'WEBP'}
+
+
+def source_format(source):
+    """Формат миниатюры при THUMBNAIL_PRESERVE_FORMAT - по расширению."""
+    extension = os.path.splitext(source.name)[1].lower()
+    return SOURCE_FORMATS.get(extension, thumbnail_settings.THUMBNAIL_FORMAT)
+
+
+def thumbnail_name(source, geometry_string, options):
+    """Имя миниатюры, как его строит ThumbnailBackend.get_thumbnail.
+
+    options дополняется умолчаниями backend и настройками sorl.
+    """
+    backend = default.backend
+    if thumbnail_settings.THUMBNAIL_PRESERVE_FORMAT:
+        options.setdefault('format', source_format(source))
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(thumbnail_settings, attr)
+        if value != getattr(default_settings, attr):
+            options.setdefault(key, value)
+    key = tokey(source.key, geometry_string, serialize(options))
+    return (f'{thumbnail_settings.THUMBNAIL_PREFIX}{key[:2]}/{key[2:4]}/'
+            f'{key}.{EXTENSIONS[options["format"]]}')
+
+
+def kvstore_get_many(kvstore, files):
+    """Записи kvstore (или None) для files в их порядке.
+
+    Для cached_db - один get_many кеша и один запрос к БД на все промахи
+    вместо запроса на каждую миниатюру; другие kvstore читаются по одной.
+    """
+    if not isinstance(kvstore, cached_db_kvstore.KVStore):
+        return [kvstore.get(file_) for file_ in files]
+    keys = [add_prefix(file_.key) for file_ in files]
+    values = kvstore.cache.get_many(keys)
+    missing = set(keys) - set(values)
+    if missing:
+        found = dict(KVStoreModel.objects.filter(
+            key__in=missing
+        ).values_list('key', 'value'))
+        # Как cached_db: отсутствие тоже кешируется, чтобы не идти в БД.
+        fetched = {key: found.get(key, cached_db_kvstore.EMPTY_VALUE)
+                   for key in missing}
+        kvstore.cache.set_many(fetched,
+                               thumbnail_settings.THUMBNAIL_CACHE_TIMEOUT)
+        values.update(fetched)
+    return [None if values[key] == cached_db_kvstore.EMPTY_VALUE
+            else deserialize_image_file(values[key]) for key in keys]
+
+
+def check_sorl_version(app_configs, **kwargs):
+    installed = metadata.version('sorl-thumbnail')
+    if installed == SORL_VERSION:
+        return []
+    return [checks.Warning(
+        f'sorl-thumbnail {installed} вместо {SORL_VERSION}',
+        hint='Сверьте posts/sorl_internals.py с исходниками sorl '
+             'и обновите SORL_VERSION.',
+        obj='posts.sorl_internals',
+        id='posts.W001',
+    )]
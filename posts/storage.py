@@ -0,0 +1,61 @@
+import hashlib
+import os
+import re
+import uuid
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+CONTENT_ADDRESSED_NAME = re.compile(r'(^|/)[0-9a-f]{2}/[0-9a-f]{64}(\.\w+)?$')
+
+
+def content_addressed(name):
+    """Имя выдано ContentAddressedStorage, а не задано вручную."""
+    return bool(name) and CONTENT_ADDRESSED_NAME.search(name) is not None
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """Хранит файл под SHA-256 содержимого: posts/ab/ab12...ef.jpg.
+
+    Хеш считается при записи файла кусками во временный файл рядом с
+    целевым, поэтому файл не читается дважды и не держится в памяти.
+    Одинаковые загрузки получают одно имя и один файл, а значит и одни
+    миниатюры sorl. Сколько постов ссылается на файл, считает
+    posts.models.StoredImage; файл удаляется вместе с последней ссылкой.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        # Имя по содержимому выбирает _save, совпадение имён - это дубликат.
+        return name
+
+    def _save(self, name, content):
+        directory = os.path.dirname(name)
+        extension = os.path.splitext(name)[1].lower()
+        full_directory = self.path(directory)
+        os.makedirs(full_directory, exist_ok=True)
+        temp_path = os.path.join(full_directory, f'.upload-{uuid.uuid4().hex}')
+        digest = hashlib.sha256()
+        try:
+            fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL
+                         | getattr(os, 'O_BINARY', 0), 0o666)
+            with os.fdopen(fd, 'wb') as temp:
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    temp.write(chunk)
+            hexdigest = digest.hexdigest()
+            name = os.path.join(directory, hexdigest[:2],
+                                hexdigest + extension)
+            path = self.path(name)
+            if os.path.exists(path):
+                os.remove(temp_path)
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                if self.file_permissions_mode is not None:
+                    os.chmod(temp_path, self.file_permissions_mode)
+                os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        return name.replace('\\', '/')
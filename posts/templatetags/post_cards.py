@@ -0,0 +1,74 @@
+import hashlib
+
+from django import template
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from posts import thumbnails
+
+register = template.Library()
+
+CARD_TEMPLATE = 'includes/post_card.html'
+
+
+def card_key(post, owner, detail):
+    """Ключ карточки меняется вместе с Post.updated.
+
+    От пользователя карточка зависит только тем, автор ли он поста,
+    поэтому у каждой версии поста не больше четырёх вариантов. Имя автора
+    и название группы в карточке тоже входят в ключ: их переименование
+    не меняет Post.updated. Автор и группа уже загружены for_listing.
+    """
+    version = post.updated.timestamp() if post.updated else 0
+    group = post.group
+    related = hashlib.md5(repr((
+        post.author.username,
+        group and (group.slug, group.title),
+    )).encode()).hexdigest()[:12]
+    return (f'post_card:{post.pk}:{version}:{related}'
+            f':{int(bool(detail))}:{int(bool(owner))}')
+
+
+def render_cards(posts, user, detail=False):
+    """HTML карточек постов в исходном порядке за один get_many.
+
+    Миниатюры незакешированных карточек ищутся одним проходом до
+    рендеринга и передаются в шаблон как images.
+    """
+    variants = [(post, user == post.author) for post in posts]
+    keys = [card_key(post, owner, detail) for post, owner in variants]
+    cards = cache.get_many(keys)
+    images = thumbnails.card_images([
+        post for key, (post, _) in zip(keys, variants) if key not in cards
+    ])
+    missing, pending = {}, {}
+    for key, (post, owner) in zip(keys, variants):
+        if key not in cards:
+            # Карточка с оригиналом вместо миниатюр живёт, пока действует
+            # отметка очереди: если задача пула потерялась или упала,
+            # следующий рендеринг поставит её снова.
+            waiting = post.image and images[post.pk] is None
+            rendered = pending if waiting else missing
+            rendered[key] = cards[key] = render_to_string(CARD_TEMPLATE, {
+                'post': post, 'owner': owner, 'detail': detail,
+                'images': images[post.pk],
+            })
+    if missing:
+        cache.set_many(missing, settings.POST_CARD_CACHE_TTL)
+    if pending:
+        cache.set_many(pending, settings.CARD_THUMBNAIL_QUEUE_TIMEOUT)
+    return [mark_safe(cards[key]) for key in keys]
+
+
+@register.simple_tag(takes_context=True)
+def post_cards(context, posts):
+    """{% post_cards page as cards %} - карточки страницы ленты."""
+    return render_cards(posts, context.get('user'))
+
+
+@register.simple_tag(takes_context=True)
+def post_card(context, post, detail=False):
+    """{% post_card post detail=True %} - карточка одного поста."""
+    return render_cards([post], context.get('user'), detail)[0]
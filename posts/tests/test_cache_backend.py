@@ -0,0 +1,115 @@
+import os
+import shutil
+import tempfile
+import time
+from unittest import mock
+
+from django.conf import settings
+from django.test import SimpleTestCase
+
+from posts.cache_backend import SQLiteCache
+
+
+class SQLiteCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.location = f'{self.directory}/cache.sqlite3'
+        self.cache = self.make_cache()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def make_cache(self, **options):
+        """Отдельный экземпляр - как кеш другого процесса."""
+        return SQLiteCache(self.location, {'OPTIONS': options})
+
+    def test_values_are_shared_between_instances(self):
+        """Значения видны всем экземплярам с тем же файлом."""
+        other = self.make_cache()
+        self.cache.set('key', {'value': 1})
+        self.cache.set_many({'a': 1, 'b': 2})
+
+        self.assertEqual(other.get('key'), {'value': 1})
+        self.assertEqual(other.get_many(['a', 'b', 'c']), {'a': 1, 'b': 2})
+
+        other.delete('key')
+        self.assertIsNone(self.cache.get('key'))
+
+    def test_add_incr_touch(self):
+        """add, incr и touch работают по контракту кеша Django."""
+        self.assertTrue(self.cache.add('counter', 1))
+        self.assertFalse(self.cache.add('counter', 5))
+        self.assertEqual(self.cache.incr('counter'), 2)
+        self.assertEqual(self.make_cache().incr('counter', 3), 5)
+        self.assertTrue(self.cache.touch('counter', None))
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    def test_zero_timeout_deletes_key(self):
+        """timeout=0 удаляет ключ сразу, без отдачи устаревшего значения."""
+        self.cache.set('key', 1)
+        self.cache.set('key', 2, 0)
+
+        self.assertIsNone(self.make_cache().get('key'))
+
+    def test_stale_value_is_recomputed_by_one_process(self):
+        """После TTL пересчитывает один процесс, остальные берут старое."""
+        self.cache.set('hot', 'old', 10)
+        workers = [self.make_cache() for _ in range(3)]
+
+        with mock.patch('time.time', return_value=time.time() + 20):
+            values = [worker.get('hot') for worker in workers]
+            self.assertFalse(self.cache.has_key('hot'))
+            self.assertTrue(self.cache.add('hot', 'add wins'))
+
+        self.assertEqual(values, [None, 'old', 'old'])
+
+    def test_stale_value_expires_after_grace(self):
+        """Через STALE_GRACE после TTL значение не отдаётся никому."""
+        self.cache.set('hot', 'old', 10)
+
+        with mock.patch('time.time', return_value=time.time() + 100):
+            self.assertIsNone(self.cache.get('hot'))
+            self.assertIsNone(self.make_cache().get('hot'))
+
+    def test_set_releases_recompute_lock(self):
+        """Новое значение снимает блокировку и сразу видно всем."""
+        self.cache.set('hot', 'old', 10)
+        worker, other = self.make_cache(), self.make_cache()
+
+        with mock.patch('time.time', return_value=time.time() + 20):
+            self.assertIsNone(worker.get('hot'))
+        worker.set('hot', 'new', 10)
+
+        self.assertEqual(other.get('hot'), 'new')
+
+    def test_early_refresh(self):
+        """Незадолго до TTL один процесс получает промах заранее."""
+        with mock.patch('time.monotonic', side_effect=[0.0, 5.0]):
+            self.cache.get('hot')
+            self.cache.set('hot', 'value', 10)
+        workers = [self.make_cache() for _ in range(3)]
+
+        with mock.patch('time.time', return_value=time.time() + 8), \
+                mock.patch('random.random', return_value=0.9):
+            values = [worker.get('hot') for worker in workers]
+
+        self.assertEqual(values, [None, 'value', 'value'])
+
+    def test_misses_are_bounded(self):
+        """Промахи по ключам, которые не записываются, не копятся."""
+        cache = self.make_cache(MISSES_SIZE=3)
+
+        for i in range(10):
+            cache.get(f'missing_{i}')
+
+        self.assertEqual(list(cache._misses),
+                         [f':1:missing_{i}' for i in range(7, 10)])
+
+    def test_tests_do_not_share_dev_cache(self):
+        """Кеш тестов лежит вне проекта, а не в файле сервера разработки."""
+        location = settings.CACHES['default']['LOCATION']
+
+        self.assertFalse(os.path.abspath(location).startswith(
+            settings.BASE_DIR + os.sep
+        ))
@@ -0,0 +1,339 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts import page_cache
+from posts.models import Group, Post
+from posts.page_cache import page_cache_stats, purge
+from posts.tests.utils import commit_callbacks
+
+User = get_user_model()
+
+
+class IndexCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test_user')
+        Post.objects.bulk_create([
+            Post(text=f'Text {i}', author=cls.user) for i in range(15)
+        ])
+        cls.post = Post.objects.first()
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(IndexCacheTests.user)
+
+    def test_pages_are_cached_separately(self):
+        """Страницы ленты кешируются под разными ключами."""
+        first = self.guest_client.get(reverse('index'))
+        second = self.guest_client.get(reverse('index'), {'page': 2})
+
+        self.assertNotEqual(first.content, second.content)
+        self.assertContains(second, 'Text 0')
+
+    def test_new_post_invalidates_feed(self):
+        """Новый пост через new_post сразу виден всем в ленте."""
+        self.guest_client.get(reverse('index'))
+
+        with commit_callbacks():
+            self.authorized_client.post(reverse('new_post'),
+                                        data={'text': 'Fresh post'})
+        response = self.guest_client.get(reverse('index'))
+
+        self.assertContains(response, 'Fresh post')
+
+    def test_comment_invalidates_feed(self):
+        """Новый комментарий обновляет счётчик в закешированной ленте."""
+        self.guest_client.get(reverse('index'))
+
+        with commit_callbacks():
+            self.authorized_client.post(
+                reverse('add_comment', kwargs={
+                    'username': IndexCacheTests.user.username,
+                    'post_id': IndexCacheTests.post.id,
+                }),
+                data={'text': 'Fresh comment'},
+            )
+        response = self.guest_client.get(reverse('index'))
+
+        self.assertContains(response, 'Комментариев: 1')
+
+    def test_orm_changes_invalidate_feed(self):
+        """Правка группы и удаление поста мимо views тоже сбрасывают ленту."""
+        group = Group.objects.create(title='Old title', slug='feed-group')
+        with commit_callbacks():
+            post = Post.objects.create(text='Doomed post', group=group,
+                                       author=IndexCacheTests.user)
+        self.assertContains(self.guest_client.get(reverse('index')),
+                            '#Old title')
+
+        with commit_callbacks():
+            group.title = 'New title'
+            group.save()
+        self.assertContains(self.guest_client.get(reverse('index')),
+                            '#New title')
+
+        with commit_callbacks():
+            post.delete()
+        self.assertNotContains(self.guest_client.get(reverse('index')),
+                               'Doomed post')
+
+    def test_author_bypasses_cache_after_write(self):
+        """Автор только что сделанной записи читает ленту мимо кеша."""
+        self.authorized_client.post(reverse('new_post'),
+                                    data={'text': 'Fresh post'})
+
+        author_response = self.authorized_client.get(reverse('index'))
+        guest_response = self.guest_client.get(reverse('index'))
+
+        self.assertTrue(author_response.context['feed_cache_bypass'])
+        self.assertFalse(guest_response.context['feed_cache_bypass'])
+
+
+@override_settings(PAGE_CACHE_ENABLED=True)
+class AnonymousPageCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(title='Test group',
+                                         slug='test-group')
+        cls.post = Post.objects.create(text='Test text', author=cls.author,
+                                       group=cls.group)
+        cls.urls = {
+            'index': reverse('index'),
+            'group': reverse('group', kwargs={'slug': cls.group.slug}),
+            'profile': reverse('profile',
+                               kwargs={'username': cls.author.username}),
+            'post': reverse('post', kwargs={
+                'username': cls.author.username, 'post_id': cls.post.id
+            }),
+        }
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.author_client = Client()
+        self.author_client.force_login(AnonymousPageCacheTests.author)
+        self.reader_client = Client()
+        self.reader_client.force_login(AnonymousPageCacheTests.reader)
+
+    def test_anonymous_pages_are_cached(self):
+        """Повторный анонимный запрос отдаётся из кеша."""
+        for name, url in AnonymousPageCacheTests.urls.items():
+            with self.subTest(name=name):
+                first = self.guest_client.get(url)
+                second = self.guest_client.get(url)
+
+                self.assertEqual(first['X-Page-Cache'], 'MISS')
+                self.assertEqual(second['X-Page-Cache'], 'HIT')
+                self.assertEqual(first.content, second.content)
+        self.assertEqual(page_cache_stats()['hits'], 4)
+
+    def test_authorized_pages_are_not_cached(self):
+        """Авторизованным пользователям страницы не кешируются."""
+        self.reader_client.get(AnonymousPageCacheTests.urls['index'])
+        response = self.reader_client.get(
+            AnonymousPageCacheTests.urls['index']
+        )
+
+        self.assertNotIn('X-Page-Cache', response)
+
+    def test_post_edit_purges_pages_with_post(self):
+        """Правка поста сбрасывает все страницы, где он показан."""
+        urls = AnonymousPageCacheTests.urls
+        for url in urls.values():
+            self.guest_client.get(url)
+
+        with commit_callbacks():
+            self.author_client.post(
+                reverse('post_edit', kwargs={
+                    'username': AnonymousPageCacheTests.author.username,
+                    'post_id': AnonymousPageCacheTests.post.id,
+                }),
+                data={'text': 'Edited text',
+                      'group': AnonymousPageCacheTests.group.id},
+            )
+
+        for name, url in urls.items():
+            with self.subTest(name=name):
+                response = self.guest_client.get(url)
+
+                self.assertEqual(response['X-Page-Cache'], 'MISS')
+                self.assertContains(response, 'Edited text')
+
+    def test_model_changes_purge_pages(self):
+        """Правки мимо views (админка, shell) тоже сбрасывают страницы."""
+        urls = AnonymousPageCacheTests.urls
+        group = AnonymousPageCacheTests.group
+
+        def rename_group():
+            renamed = Group.objects.get(pk=group.pk)
+            renamed.title = 'Renamed group'
+            renamed.save()
+
+        def create_post():
+            Post.objects.create(text='Admin post', group=group,
+                                author=AnonymousPageCacheTests.author)
+
+        for change, purged in ((rename_group, list(urls)),
+                               (create_post, ['index', 'group', 'profile'])):
+            for url in urls.values():
+                self.guest_client.get(url)
+
+            with commit_callbacks():
+                change()
+
+            for name in purged:
+                with self.subTest(change=change.__name__, name=name):
+                    self.assertEqual(
+                        self.guest_client.get(urls[name])['X-Page-Cache'],
+                        'MISS',
+                    )
+
+    def test_follow_purges_only_affected_profiles(self):
+        """Подписка сбрасывает профили участников, но не чужие страницы."""
+        urls = AnonymousPageCacheTests.urls
+        self.guest_client.get(urls['profile'])
+        self.guest_client.get(urls['group'])
+
+        with commit_callbacks():
+            self.reader_client.get(reverse(
+                'profile_follow',
+                kwargs={'username': AnonymousPageCacheTests.author.username}
+            ))
+
+        self.assertEqual(
+            self.guest_client.get(urls['profile'])['X-Page-Cache'], 'MISS'
+        )
+        self.assertEqual(
+            self.guest_client.get(urls['group'])['X-Page-Cache'], 'HIT'
+        )
+
+    def test_purge_waits_for_commit(self):
+        """До коммита страница остаётся в кеше: сброс после коммита."""
+        url = AnonymousPageCacheTests.urls['post']
+        self.guest_client.get(url)
+
+        with commit_callbacks():
+            purge(f'post:{AnonymousPageCacheTests.post.pk}')
+            before_commit = self.guest_client.get(url)
+        after_commit = self.guest_client.get(url)
+
+        self.assertEqual(before_commit['X-Page-Cache'], 'HIT')
+        self.assertEqual(after_commit['X-Page-Cache'], 'MISS')
+
+    def test_purge_during_render_is_not_cached_over(self):
+        """Ответ, во время отрисовки которого был сброс, не сохраняется."""
+        url = AnonymousPageCacheTests.urls['post']
+        render = page_cache.tag_response
+
+        def purge_while_rendering(response, *tags):
+            page_cache._purge_now(tags)
+            return render(response, *tags)
+
+        with mock.patch('posts.views.tag_response', purge_while_rendering):
+            self.guest_client.get(url)
+        response = self.guest_client.get(url)
+
+        self.assertEqual(response['X-Page-Cache'], 'MISS')
+
+
+class PostCardCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(title='Test group',
+                                         slug='test-group')
+        for i in range(3):
+            cls.post = Post.objects.create(text=f'Text {i}',
+                                           author=cls.author,
+                                           group=cls.group)
+        cls.edit_url = reverse('post_edit', kwargs={
+            'username': cls.author.username, 'post_id': cls.post.id
+        })
+        cls.urls = (
+            reverse('index'),
+            reverse('group', kwargs={'slug': cls.group.slug}),
+            reverse('profile', kwargs={'username': cls.author.username}),
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.author_client = Client()
+        self.author_client.force_login(PostCardCacheTests.author)
+        self.reader_client = Client()
+        self.reader_client.force_login(PostCardCacheTests.reader)
+
+    def test_edit_link_only_for_author(self):
+        """Закешированная карточка не показывает чужим ссылку на правку."""
+        edit_url = PostCardCacheTests.edit_url
+        for url in PostCardCacheTests.urls:
+            with self.subTest(url=url):
+                self.assertContains(self.author_client.get(url), edit_url)
+                self.assertNotContains(self.reader_client.get(url),
+                                       edit_url)
+
+    def test_cards_are_fetched_with_one_get_many(self):
+        """Карточки страницы читаются из кеша одним get_many."""
+        url = reverse('group', kwargs={'slug': PostCardCacheTests.group.slug})
+        self.reader_client.get(url)
+
+        with mock.patch.object(cache, 'get_many',
+                               wraps=cache.get_many) as get_many, \
+                mock.patch('posts.templatetags.post_cards.render_to_string'
+                           ) as render:
+            self.reader_client.get(url)
+
+        get_many.assert_called_once()
+        self.assertEqual(len(get_many.call_args[0][0]), 3)
+        render.assert_not_called()
+
+    def test_edit_and_comment_refresh_card(self):
+        """Правка и новый комментарий меняют версию карточки."""
+        post = PostCardCacheTests.post
+        url = reverse('group', kwargs={'slug': PostCardCacheTests.group.slug})
+        self.reader_client.get(url)
+
+        self.author_client.post(PostCardCacheTests.edit_url,
+                                data={'text': 'Edited text',
+                                      'group': PostCardCacheTests.group.id})
+        self.reader_client.post(
+            reverse('add_comment', kwargs={
+                'username': PostCardCacheTests.author.username,
+                'post_id': post.id,
+            }),
+            data={'text': 'Fresh comment'},
+        )
+        response = self.reader_client.get(url)
+
+        self.assertContains(response, 'Edited text')
+        self.assertContains(response, 'Комментариев: 1')
+
+    def test_group_and_author_rename_refresh_card(self):
+        """Переименование группы или автора меняет ключ карточки."""
+        author = User.objects.get(pk=PostCardCacheTests.author.pk)
+        group = Group.objects.get(pk=PostCardCacheTests.group.pk)
+        self.reader_client.get(
+            reverse('profile', kwargs={'username': author.username})
+        )
+
+        group.title = 'Renamed group'
+        group.save()
+        author.username = 'renamed'
+        author.save()
+        response = self.reader_client.get(
+            reverse('profile', kwargs={'username': 'renamed'})
+        )
+
+        self.assertContains(response, '#Renamed group')
+        self.assertContains(response, '@renamed')
@@ -0,0 +1,110 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Group, Post
+
+User = get_user_model()
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(title='Test group',
+                                         slug='test-group')
+        cls.post = Post.objects.create(text='Test text', author=cls.author,
+                                       group=cls.group)
+        cls.urls = {
+            'index': reverse('index'),
+            'group': reverse('group', kwargs={'slug': cls.group.slug}),
+            'profile': reverse('profile',
+                               kwargs={'username': cls.author.username}),
+            'post': reverse('post', kwargs={
+                'username': cls.author.username, 'post_id': cls.post.id
+            }),
+        }
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.reader_client = Client()
+        self.reader_client.force_login(ConditionalGetTests.reader)
+
+    def test_current_copy_is_not_modified(self):
+        """Актуальная копия клиента получает 304 без рендеринга."""
+        for name, url in ConditionalGetTests.urls.items():
+            with self.subTest(name=name):
+                first = self.reader_client.get(url)
+                second = self.reader_client.get(
+                    url, HTTP_IF_NONE_MATCH=first['ETag']
+                )
+
+                self.assertEqual(second.status_code, 304)
+                self.assertEqual(second['ETag'], first['ETag'])
+                self.assertEqual(second.templates, [])
+
+    def test_no_last_modified(self):
+        """Без ETag 304 не отдаётся: время постов не покрывает подписку."""
+        url = ConditionalGetTests.urls['profile']
+        first = self.reader_client.get(url)
+
+        response = self.reader_client.get(
+            url, HTTP_IF_MODIFIED_SINCE='Fri, 01 Jan 2100 00:00:00 GMT'
+        )
+
+        self.assertNotIn('Last-Modified', first)
+        self.assertEqual(response.status_code, 200)
+
+    def test_comment_changes_validators(self):
+        """Новый комментарий делает копию поста устаревшей."""
+        url = ConditionalGetTests.urls['post']
+        etag = self.reader_client.get(url)['ETag']
+
+        self.reader_client.post(
+            reverse('add_comment', kwargs={
+                'username': ConditionalGetTests.author.username,
+                'post_id': ConditionalGetTests.post.id,
+            }),
+            data={'text': 'Fresh comment'},
+        )
+        response = self.reader_client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Fresh comment')
+
+    def test_follow_changes_profile_validators(self):
+        """Подписка меняет счётчики и кнопку в профиле."""
+        url = ConditionalGetTests.urls['profile']
+        etag = self.reader_client.get(url)['ETag']
+
+        self.reader_client.get(reverse(
+            'profile_follow',
+            kwargs={'username': ConditionalGetTests.author.username}
+        ))
+        response = self.reader_client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 200)
+
+    def test_validators_differ_between_users(self):
+        """Страница гостя не подходит авторизованному пользователю."""
+        url = ConditionalGetTests.urls['index']
+        etag = self.guest_client.get(url)['ETag']
+
+        response = self.reader_client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(PAGE_CACHE_ENABLED=True)
+    def test_page_cache_hit_is_conditional(self):
+        """Попадание в кеш страниц тоже отвечает 304."""
+        url = ConditionalGetTests.urls['group']
+        etag = self.guest_client.get(url)['ETag']
+
+        response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['X-Page-Cache'], 'HIT')
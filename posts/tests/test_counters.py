@@ -0,0 +1,114 @@
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.forms import PostForm
+from posts.models import Comment, Follow, Post, UserStats
+
+User = get_user_model()
+
+
+class CountersTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.post = Post.objects.create(text='Test text', author=cls.author)
+
+    def setUp(self):
+        self.reader_client = Client()
+        self.reader_client.force_login(CountersTests.reader)
+
+    def test_comment_counter(self):
+        """Счётчик комментариев поста следует за Comment."""
+        kwargs = {'username': CountersTests.author.username,
+                  'post_id': CountersTests.post.id}
+
+        self.reader_client.post(reverse('add_comment', kwargs=kwargs),
+                                data={'text': 'Test comment'})
+        CountersTests.post.refresh_from_db()
+        self.assertEqual(CountersTests.post.comments_count, 1)
+
+        Comment.objects.all().delete()
+        CountersTests.post.refresh_from_db()
+        self.assertEqual(CountersTests.post.comments_count, 0)
+
+    def test_post_edit_keeps_concurrent_comments(self):
+        """Правка поста не затирает комментарии, добавленные во время неё."""
+        author_client = Client()
+        author_client.force_login(CountersTests.author)
+        clean = PostForm.clean
+
+        def comment_meanwhile(form):
+            Comment.objects.create(text='Meanwhile', post=CountersTests.post,
+                                   author=CountersTests.reader)
+            return clean(form)
+
+        with mock.patch.object(PostForm, 'clean', autospec=True,
+                               side_effect=comment_meanwhile):
+            author_client.post(
+                reverse('post_edit', kwargs={
+                    'username': CountersTests.author.username,
+                    'post_id': CountersTests.post.id,
+                }),
+                data={'text': 'Edited text'},
+            )
+
+        CountersTests.post.refresh_from_db()
+        self.assertEqual(CountersTests.post.text, 'Edited text')
+        self.assertEqual(CountersTests.post.comments_count, 1)
+
+    def test_follow_counters(self):
+        """Подписка и отписка меняют счётчики обоих пользователей."""
+        kwargs = {'username': CountersTests.author.username}
+
+        self.reader_client.get(reverse('profile_follow', kwargs=kwargs))
+        self.assertEqual(
+            UserStats.for_user(CountersTests.author).followers_count, 1
+        )
+        self.assertEqual(
+            UserStats.for_user(CountersTests.reader).following_count, 1
+        )
+
+        self.reader_client.get(reverse('profile_unfollow', kwargs=kwargs))
+        self.assertEqual(
+            UserStats.for_user(CountersTests.author).followers_count, 0
+        )
+        self.assertEqual(
+            UserStats.for_user(CountersTests.reader).following_count, 0
+        )
+
+    def test_post_counter(self):
+        """Счётчик постов автора следует за Post."""
+        post = Post.objects.create(text='Another text',
+                                   author=CountersTests.author)
+        self.assertEqual(UserStats.for_user(CountersTests.author).posts_count,
+                         2)
+
+        post.delete()
+        self.assertEqual(UserStats.for_user(CountersTests.author).posts_count,
+                         1)
+
+    def test_repair_counters_command(self):
+        """repair_counters исправляет разошедшиеся счётчики."""
+        Follow.objects.create(user=CountersTests.reader,
+                              author=CountersTests.author)
+        Post.objects.filter(pk=CountersTests.post.pk).update(
+            comments_count=7
+        )
+        UserStats.objects.filter(user=CountersTests.author).update(
+            posts_count=0, followers_count=5
+        )
+
+        call_command('repair_counters', stdout=StringIO())
+
+        CountersTests.post.refresh_from_db()
+        stats = UserStats.for_user(CountersTests.author)
+        self.assertEqual(CountersTests.post.comments_count, 0)
+        self.assertEqual(stats.posts_count, 1)
+        self.assertEqual(stats.followers_count, 1)
@@ -0,0 +1,80 @@
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Follow, Post
+
+User = get_user_model()
+
+
+class FollowFeedEngineTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.authors = [
+            User.objects.create_user(username=f'author_{i}')
+            for i in range(4)
+        ]
+        stranger = User.objects.create_user(username='stranger')
+        for author in cls.authors[:3]:
+            Follow.objects.create(user=cls.reader, author=author)
+        for i in range(24):
+            Post.objects.create(text=f'Text {i}',
+                                author=cls.authors[i % 4])
+        Post.objects.create(text='Stranger text', author=stranger)
+        cls.expected = list(
+            Post.objects.filter(author__in=cls.authors[:3]).order_by(
+                '-pub_date', '-pk'
+            ).values_list('pk', flat=True)
+        )
+
+    def setUp(self):
+        self.reader_client = Client()
+        self.reader_client.force_login(FollowFeedEngineTests.reader)
+
+    def walk_feed(self):
+        seen = []
+        response = self.reader_client.get(reverse('follow_index'))
+        while True:
+            page = response.context['page']
+            seen.extend(post.pk for post in page)
+            if not page.has_next():
+                return seen, page
+            response = self.reader_client.get(
+                reverse('follow_index'), {'cursor': page.next_cursor}
+            )
+
+    def test_engines_return_same_feed(self):
+        """Все движки отдают одинаковую ленту подписок."""
+        for engine in ('join', 'timeline', 'merge'):
+            with self.subTest(engine=engine), override_settings(
+                    FOLLOW_FEED_ENGINE=engine, POSTS_PAGINATION='cursor'):
+                seen, _ = self.walk_feed()
+
+                self.assertEqual(seen, FollowFeedEngineTests.expected)
+
+    @override_settings(FOLLOW_FEED_ENGINE='merge')
+    def test_merge_engine_previous_cursor(self):
+        """previous-курсор движка merge возвращает на страницу назад."""
+        _, last_page = self.walk_feed()
+
+        response = self.reader_client.get(
+            reverse('follow_index'), {'cursor': last_page.previous_cursor}
+        )
+
+        self.assertEqual(
+            [post.pk for post in response.context['page']],
+            FollowFeedEngineTests.expected[:10],
+        )
+
+    @override_settings(FOLLOW_FEED_ENGINE='merge')
+    def test_merge_engine_page_number_links_still_work(self):
+        """Движок merge понимает старые ссылки ?page=N."""
+        response = self.reader_client.get(reverse('follow_index'),
+                                          {'page': 2})
+
+        self.assertEqual(
+            [post.pk for post in response.context['page']],
+            FollowFeedEngineTests.expected[10:],
+        )
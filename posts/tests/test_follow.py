@@ -0,0 +1,103 @@
+from http import HTTPStatus
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Follow, UserStats
+
+User = get_user_model()
+
+
+class FollowJsonTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+        cls.follow_url = reverse('profile_follow_json',
+                                 kwargs={'username': cls.author.username})
+        cls.unfollow_url = reverse('profile_unfollow_json',
+                                   kwargs={'username': cls.author.username})
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(FollowJsonTests.user)
+
+    def test_follow_returns_new_counts(self):
+        """Подписка возвращает состояние и новые счётчики."""
+        response = self.authorized_client.post(FollowJsonTests.follow_url)
+
+        self.assertEqual(response.json(), {
+            'following': True, 'changed': True,
+            'followers_count': 1, 'following_count': 1,
+        })
+        self.assertTrue(Follow.objects.filter(
+            user=FollowJsonTests.user, author=FollowJsonTests.author
+        ).exists())
+
+    def test_follow_is_idempotent(self):
+        """Повторная подписка ничего не меняет и не падает."""
+        self.authorized_client.post(FollowJsonTests.follow_url)
+
+        response = self.authorized_client.post(FollowJsonTests.follow_url)
+
+        self.assertEqual(response.json()['changed'], False)
+        self.assertEqual(response.json()['followers_count'], 1)
+        self.assertEqual(Follow.objects.count(), 1)
+
+    def test_follow_without_existence_check(self):
+        """Подписка - сразу INSERT, отписка - выборка строк и DELETE."""
+        for url, statements in ((FollowJsonTests.follow_url, ['INSERT']),
+                                (FollowJsonTests.unfollow_url,
+                                 ['SELECT', 'DELETE'])):
+            with self.subTest(url=url), \
+                    CaptureQueriesContext(connection) as queries:
+                self.authorized_client.post(url)
+
+            follow_queries = [query['sql']
+                              for query in queries.captured_queries
+                              if '"posts_follow"' in query['sql']]
+            self.assertEqual(
+                [sql.split()[0] for sql in follow_queries[:len(statements)]],
+                statements,
+            )
+
+    def test_unfollow_returns_new_counts(self):
+        """Отписка уменьшает счётчики; повторная ничего не меняет."""
+        self.authorized_client.post(FollowJsonTests.follow_url)
+
+        response = self.authorized_client.post(FollowJsonTests.unfollow_url)
+        again = self.authorized_client.post(FollowJsonTests.unfollow_url)
+
+        self.assertEqual(response.json(), {
+            'following': False, 'changed': True,
+            'followers_count': 0, 'following_count': 0,
+        })
+        self.assertEqual(again.json()['changed'], False)
+        self.assertEqual(
+            UserStats.for_user(FollowJsonTests.author).followers_count, 0
+        )
+
+    def test_cannot_follow_self(self):
+        """На себя подписаться нельзя."""
+        response = self.authorized_client.post(reverse(
+            'profile_follow_json',
+            kwargs={'username': FollowJsonTests.user.username},
+        ))
+
+        self.assertEqual(response.json()['following'], False)
+        self.assertFalse(Follow.objects.exists())
+
+    def test_requires_login_and_post(self):
+        """Аноним получает 401, GET - 405."""
+        guest = self.guest_client.post(FollowJsonTests.follow_url)
+        get = self.authorized_client.get(FollowJsonTests.follow_url)
+
+        self.assertEqual(guest.status_code, HTTPStatus.UNAUTHORIZED)
+        self.assertEqual(get.status_code, HTTPStatus.METHOD_NOT_ALLOWED)
@@ -1,3 +1,4 @@
+import hashlib
 import os
 import shutil
 
@@ -76,12 +77,13 @@ class PostFormTest(TestCase):
 
         self.assertRedirects(response, reverse('index'))
         self.assertEqual(Post.objects.count(), posts_count + 1)
+        digest = hashlib.sha256(small_gif).hexdigest()
         self.assertTrue(
             Post.objects.filter(
                 text='New test text',
                 author=PostFormTest.user,
                 group=PostFormTest.group.id,
-                image='posts/small.gif'
+                image=f'posts/{digest[:2]}/{digest}.gif'
             ).exists()
         )
 
@@ -0,0 +1,156 @@
+import json
+import os
+import shutil
+import tempfile
+from datetime import datetime, timezone
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from posts.models import Comment, Follow, Group, Post, TimelineEntry
+
+User = get_user_model()
+
+RECORDS = [
+    {'type': 'group', 'slug': 'imported', 'title': 'Imported group'},
+    {'type': 'post', 'id': 500, 'author': 'writer', 'group': 'imported',
+     'text': 'Imported post', 'pub_date': '2020-01-02T03:04:05+00:00'},
+    {'type': 'comment', 'post': 500, 'author': 'reader',
+     'text': 'Imported comment'},
+    {'type': 'follow', 'user': 'reader', 'author': 'writer'},
+    {'type': 'comment', 'post': 999, 'author': 'reader', 'text': 'Orphan'},
+    {'type': 'unknown'},
+]
+
+
+class ImportPostsTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def import_file(self, name, content, **options):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w', encoding='utf-8') as stream:
+            stream.write(content)
+        call_command('import_posts', path, stdout=StringIO(),
+                     stderr=StringIO(), **options)
+
+    def test_jsonl_import(self):
+        """Загрузка JSONL создаёт связанные объекты и пропускает битые."""
+        self.import_file('data.jsonl', '\n'.join(
+            json.dumps(record) for record in RECORDS
+        ), batch_size=2)
+
+        post = Post.objects.get(pk=500)
+        self.assertEqual(post.author.username, 'writer')
+        self.assertEqual(post.group, Group.objects.get(slug='imported'))
+        self.assertEqual(post.pub_date,
+                         datetime(2020, 1, 2, 3, 4, 5, tzinfo=timezone.utc))
+        self.assertEqual(Comment.objects.get().text, 'Imported comment')
+        self.assertTrue(Follow.objects.filter(user__username='reader',
+                                              author__username='writer'))
+
+    def test_import_repairs_derived_data(self):
+        """После загрузки счётчики и ленты подписок согласованы."""
+        self.import_file('data.jsonl', '\n'.join(
+            json.dumps(record) for record in RECORDS
+        ))
+
+        post = Post.objects.get(pk=500)
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(post.author.stats.posts_count, 1)
+        self.assertEqual(post.author.stats.followers_count, 1)
+        self.assertTrue(TimelineEntry.objects.filter(
+            user__username='reader', post=post
+        ).exists())
+
+    def test_csv_import(self):
+        """CSV с колонкой type загружается так же."""
+        self.import_file('data.csv', (
+            'type,id,author,user,group,slug,title,text,post\n'
+            'group,,,,,csv-group,CSV group,,\n'
+            'post,700,writer,,csv-group,,,CSV post,\n'
+            'comment,,reader,,,,,CSV comment,700\n'
+        ))
+
+        post = Post.objects.get(pk=700)
+        self.assertEqual(post.group.slug, 'csv-group')
+        self.assertEqual(post.comments.get().text, 'CSV comment')
+
+    def test_queries_do_not_grow_with_records(self):
+        """Число запросов зависит от числа пачек, а не записей."""
+        queries = []
+        for count in (10, 100):
+            with CaptureQueriesContext(connection) as context:
+                self.import_file(f'{count}.jsonl', '\n'.join(json.dumps({
+                    'type': 'post', 'author': f'author_{count}_{i % 3}',
+                    'text': f'Post {i}',
+                }) for i in range(count)))
+            queries.append(len(context))
+
+        self.assertEqual(queries[0], queries[1])
+
+    def test_bad_lines_are_skipped(self):
+        """Битый JSON и не-объекты пропускаются, остальное загружается."""
+        self.import_file('data.jsonl', '\n'.join([
+            '{"type": "post", "author": "writer", "text": "Before"',
+            '["type", "post"]',
+            json.dumps({'type': 'post', 'author': 'writer', 'text': 'After'}),
+        ]))
+
+        self.assertEqual(list(Post.objects.values_list('text', flat=True)),
+                         ['After'])
+
+    def test_wrong_types_are_skipped(self):
+        """Запись с полем не того типа пропускается, а не роняет загрузку."""
+        self.import_file('data.jsonl', '\n'.join(map(json.dumps, [
+            {'type': 'post', 'author': ['a'], 'text': 'List author'},
+            {'type': 'post', 'author': 'writer', 'group': ['g'],
+             'text': 'List group'},
+            {'type': 'post', 'author': 'writer', 'pub_date': 5,
+             'text': 'Number date'},
+            {'type': 'post', 'author': 'writer', 'text': {'a': 1}},
+            {'type': 'comment', 'post': [1], 'author': 'writer',
+             'text': 'List post'},
+            {'type': 'post', 'id': 7, 'author': 42, 'text': 'Good'},
+        ])))
+
+        post = Post.objects.get()
+        self.assertEqual((post.pk, post.text, post.author.username),
+                         (7, 'Good', '42'))
+        self.assertFalse(Comment.objects.exists())
+
+    def test_existing_post_id_is_not_overwritten(self):
+        """Пост с занятым id пропускается вместе со своими комментариями."""
+        author = User.objects.create_user(username='owner')
+        Post.objects.create(pk=500, text='original', author=author)
+
+        self.import_file('data.jsonl', '\n'.join(
+            json.dumps(record) for record in RECORDS[:3]
+        ))
+
+        post = Post.objects.get(pk=500)
+        self.assertEqual(post.text, 'original')
+        self.assertFalse(post.comments.exists())
+
+    def test_repeated_post_id_is_skipped(self):
+        """Повтор id в пачке и в следующих пачках не загружается."""
+        post = {'type': 'post', 'id': 500, 'author': 'writer'}
+        for batch_size in (10, 1):
+            with self.subTest(batch_size=batch_size):
+                Post.objects.all().delete()
+                self.import_file('data.jsonl', '\n'.join([
+                    json.dumps({**post, 'text': 'First'}),
+                    json.dumps({**post, 'text': 'Second'}),
+                ]), batch_size=batch_size)
+
+                self.assertEqual(
+                    list(Post.objects.values_list('text', flat=True)),
+                    ['First'],
+                )
@@ -0,0 +1,81 @@
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.utils import timezone
+
+from posts.feeds import followed_posts_timeline
+from posts.models import Follow, Group, Post
+from posts.pagination import NEXT, PREVIOUS, keyset_order, keyset_q
+
+User = get_user_model()
+
+
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN из SQLite')
+class QueryPlanTests(TestCase):
+    """Ленты читаются по индексам, без полного скана и сортировки."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test_user')
+        cls.group = Group.objects.create(title='Test group',
+                                         slug='test-group')
+        cls.post = Post.objects.create(text='Test text', author=cls.user,
+                                       group=cls.group)
+
+    def query_plan(self, queryset):
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            return ' | '.join(row[-1] for row in cursor.fetchall())
+
+    def assertUsesIndex(self, queryset, index):
+        plan = self.query_plan(queryset)
+        self.assertIn(f'USING INDEX {index}', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_feeds_use_composite_indexes(self):
+        """Ленты и комментарии используют составные индексы."""
+        user = QueryPlanTests.user
+        querysets = {
+            'post_date_idx': Post.objects.for_listing(),
+            'post_group_date_idx': QueryPlanTests.group.posts.for_listing(),
+            'post_author_date_id_idx': user.posts.for_listing(),
+            'comment_post_created_idx':
+                QueryPlanTests.post.comments.for_listing(),
+            'timeline_user_date_idx': followed_posts_timeline(user),
+        }
+
+        for index, queryset in querysets.items():
+            with self.subTest(index=index):
+                self.assertUsesIndex(queryset[:10], index)
+
+    def test_cursor_pages_use_composite_indexes(self):
+        """Курсорные страницы в обе стороны читают индекс диапазоном."""
+        key = (timezone.now(), QueryPlanTests.post.pk)
+        querysets = {
+            'post_date_idx': Post.objects.for_listing(),
+            'post_group_date_idx': QueryPlanTests.group.posts.for_listing(),
+            'post_author_date_id_idx':
+                QueryPlanTests.user.posts.for_listing(),
+        }
+
+        for index, queryset in querysets.items():
+            for direction in (NEXT, PREVIOUS):
+                with self.subTest(index=index, direction=direction):
+                    self.assertUsesIndex(
+                        queryset.filter(keyset_q(direction, key)).order_by(
+                            *keyset_order(direction)
+                        )[:11],
+                        index,
+                    )
+
+    def test_followers_lookup_uses_reverse_index(self):
+        """Подписчики автора ищутся по индексу (author, user)."""
+        queryset = Follow.objects.filter(
+            author=QueryPlanTests.user
+        ).values_list('user_id', flat=True)
+
+        self.assertIn('follow_author_user_idx', self.query_plan(queryset))
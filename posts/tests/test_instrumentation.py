@@ -0,0 +1,151 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts import instrumentation
+from posts.instrumentation import profiling_token, stats
+from posts.models import Post
+
+User = get_user_model()
+
+
+class RequestStatsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test_user')
+        cls.admin = User.objects.create_user(username='admin',
+                                             is_staff=True)
+        Post.objects.create(text='Test text', author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        stats.reset()
+        self.guest_client = Client()
+
+    def test_middleware_records_view_metrics(self):
+        """Middleware записывает SQL, время БД и шаблонов по view."""
+        self.guest_client.get(reverse('index'))
+        self.guest_client.get(reverse('index'))
+
+        row = stats.summary()['index']
+
+        self.assertEqual(row['count'], 2)
+        self.assertGreater(row['queries_sum'], 0)
+        self.assertGreater(row['db_time_sum'], 0)
+        self.assertGreater(row['render_time_sum'], 0)
+        self.assertGreaterEqual(row['wall_time_sum'],
+                                row['render_time_sum'])
+
+    def test_stats_page_for_staff_only(self):
+        """Страница статистики доступна только персоналу."""
+        self.guest_client.get(reverse('index'))
+        admin_client = Client()
+        admin_client.force_login(RequestStatsTests.admin)
+
+        guest_response = self.guest_client.get(reverse('request_stats'))
+        admin_response = admin_client.get(reverse('request_stats'))
+
+        self.assertEqual(guest_response.status_code, 302)
+        self.assertContains(admin_response, '<td>index</td>')
+
+    def test_request_stats_command(self):
+        """Команда request_stats выводит сводку по view."""
+        self.guest_client.get(
+            reverse('profile', kwargs={'username': 'test_user'})
+        )
+        out = StringIO()
+
+        call_command('request_stats', stdout=out)
+
+        self.assertIn('profile', out.getvalue())
+
+    def publish_as(self, key):
+        with mock.patch.object(instrumentation, '_process_key',
+                               return_value=key):
+            instrumentation.publish()
+
+    def test_processes_register_once_each(self):
+        """Каждый процесс занимает в реестре один слот, и collect
+        складывает сводки всех процессов, не регистрируя свой."""
+        stats.record('index', queries=1, db_time=0.0, render_time=0.0,
+                     wall_time=0.1)
+        keys = {f'request_stats:host:{pid}' for pid in (1, 2)}
+        for key in sorted(keys):
+            with mock.patch.object(instrumentation, '_slot', None):
+                self.publish_as(key)
+                self.publish_as(key)
+
+        self.assertEqual(instrumentation._registered(), keys)
+        self.assertEqual(instrumentation.collect()[0]['count'], 3)
+        self.assertEqual(instrumentation._registered(), keys)
+
+    @override_settings(REQUEST_STATS_MAX_PROCESSES=2)
+    def test_free_slots_are_reused(self):
+        """Слот остановленного процесса достаётся новому процессу."""
+        for pid in (1, 2, 3):
+            with mock.patch.object(instrumentation, '_slot', None):
+                self.publish_as(f'request_stats:host:{pid}')
+
+        self.assertEqual(instrumentation._registered(),
+                         {'request_stats:host:1', 'request_stats:host:2'})
+
+        cache.delete(instrumentation.REGISTRY_SLOT.format(1))
+        with mock.patch.object(instrumentation, '_slot', None):
+            self.publish_as('request_stats:host:3')
+
+        self.assertEqual(instrumentation._registered(),
+                         {'request_stats:host:2', 'request_stats:host:3'})
+
+
+@override_settings(PROFILING_DIR=tempfile.mkdtemp())
+class ProfilingTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test_user')
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def tearDown(self):
+        shutil.rmtree(settings.PROFILING_DIR, ignore_errors=True)
+
+    def profiles(self, url_name):
+        directory = os.path.join(settings.PROFILING_DIR, url_name)
+        if not os.path.isdir(directory):
+            return []
+        return os.listdir(directory)
+
+    def test_signed_header_enables_profiling(self):
+        """Запрос с подписанным заголовком сохраняет профиль."""
+        self.guest_client.get(reverse('index'),
+                              HTTP_X_PROFILE=profiling_token())
+
+        profiles = self.profiles('index')
+        self.assertEqual(len(profiles), 1)
+        self.assertTrue(profiles[0].endswith('.prof'))
+
+    def test_bad_signature_is_ignored(self):
+        """Заголовок с чужой подписью не включает профилирование."""
+        self.guest_client.get(reverse('index'), HTTP_X_PROFILE='profile:x')
+
+        self.assertEqual(self.profiles('index'), [])
+
+    @override_settings(PROFILING_SAMPLE_RATE=1)
+    def test_sampling_groups_profiles_by_url_name(self):
+        """Выборочные профили раскладываются по имени URL."""
+        self.guest_client.get(reverse('profile',
+                                      kwargs={'username': 'test_user'}))
+
+        self.assertEqual(len(self.profiles('profile')), 1)
@@ -0,0 +1,211 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.http import Http404
+from django.test import Client, SimpleTestCase, TestCase
+from django.urls import reverse
+
+from posts import object_cache
+from posts.bloom import BloomFilter
+from posts.models import Comment, Group, Post
+from posts.tests.utils import commit_callbacks
+
+User = get_user_model()
+
+
+class ObjectCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(title='Test group',
+                                         slug='test-group')
+        cls.post = Post.objects.create(text='Test text', author=cls.author,
+                                       group=cls.group)
+
+    def setUp(self):
+        cache.clear()
+        object_cache.local.clear()
+        self.guest_client = Client()
+
+    def test_lookups_are_cached(self):
+        """Повторный поиск по username, slug и id не ходит в БД."""
+        author = ObjectCacheTests.author
+        lookups = {
+            'user': lambda: object_cache.get_user(author.username),
+            'group': lambda: object_cache.get_group(
+                ObjectCacheTests.group.slug
+            ),
+            'post': lambda: object_cache.get_post(author.username,
+                                                  ObjectCacheTests.post.pk),
+        }
+        for name, lookup in lookups.items():
+            with self.subTest(name=name):
+                first = lookup()
+                with self.assertNumQueries(0):
+                    self.assertEqual(lookup(), first)
+                object_cache.local.clear()
+                with self.assertNumQueries(0):
+                    self.assertEqual(lookup(), first)
+
+    def test_post_of_other_author_is_not_found(self):
+        """Кешированный пост не находится по чужому username."""
+        object_cache.get_post(ObjectCacheTests.author.username,
+                              ObjectCacheTests.post.pk)
+        User.objects.create_user(username='other')
+
+        with self.assertRaises(Http404):
+            object_cache.get_post('other', ObjectCacheTests.post.pk)
+
+    def test_saves_invalidate_cache(self):
+        """Правка поста, комментарий и переименование сбрасывают кеш."""
+        author = ObjectCacheTests.author
+        post = ObjectCacheTests.post
+        object_cache.get_post(author.username, post.pk)
+
+        edited = Post.objects.get(pk=post.pk)
+        edited.text = 'Edited text'
+        edited.save()
+        Comment.objects.create(text='Comment', author=author, post=post)
+        cached = object_cache.get_post(author.username, post.pk)
+        self.assertEqual(cached.text, 'Edited text')
+        self.assertEqual(cached.comments_count, 1)
+
+        group = ObjectCacheTests.group
+        object_cache.get_group(group.slug)
+        group.slug = 'renamed-group'
+        group.save()
+        with self.assertRaises(Http404):
+            object_cache.get_group('test-group')
+        self.assertEqual(object_cache.get_group('renamed-group'), group)
+
+    def test_renamed_author_posts_are_refreshed(self):
+        """После смены username пост открывается только по новому."""
+        author = User.objects.get(pk=ObjectCacheTests.author.pk)
+        post = ObjectCacheTests.post
+        object_cache.get_user(author.username)
+        object_cache.get_post(author.username, post.pk)
+
+        author.username = 'renamed'
+        author.save()
+
+        with self.assertRaises(Http404):
+            object_cache.get_user('author')
+        self.assertEqual(object_cache.get_post('renamed', post.pk), post)
+        response = self.guest_client.get(
+            reverse('post', kwargs={'username': 'author',
+                                    'post_id': post.pk})
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_cached_objects_are_copies_without_password(self):
+        """Запрос получает свою копию; хеш пароля в кеш не попадает."""
+        author = ObjectCacheTests.author
+        object_cache.get_post(author.username, ObjectCacheTests.post.pk)
+
+        object_cache.get_user(author.username).username = 'changed'
+        session_user = object_cache.get_user_by_id(author.pk)
+
+        self.assertEqual(object_cache.get_user(author.username).username,
+                         author.username)
+        for key in ('object:user:author', f'object:user_id:{author.pk}',
+                    f'object:post:{ObjectCacheTests.post.pk}'):
+            with self.subTest(key=key):
+                cached = cache.get(key)
+                user = getattr(cached, 'author', cached)
+                self.assertNotIn('password', user.__dict__)
+        self.assertEqual(session_user.get_session_auth_hash(),
+                         User.objects.get(pk=author.pk)
+                         .get_session_auth_hash())
+
+    def test_forget_repeats_after_commit(self):
+        """Объект, закешированный до коммита, сбрасывается после него."""
+        group = ObjectCacheTests.group
+
+        with commit_callbacks():
+            object_cache.forget('group', group.slug)
+            object_cache.get_group(group.slug)
+        object_cache.local.clear()
+
+        self.assertIsNone(cache.get(f'object:group:{group.slug}'))
+
+    def test_session_hash_follows_new_password(self):
+        """После set_password хеш сессии считается по новому паролю."""
+        user = object_cache.get_user_by_id(ObjectCacheTests.author.pk)
+        old_hash = user.get_session_auth_hash()
+
+        user.set_password('new-password')
+
+        self.assertNotEqual(user.get_session_auth_hash(), old_hash)
+
+
+class UnknownNameTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(title='Test group',
+                                         slug='test-group')
+
+    def setUp(self):
+        cache.clear()
+        object_cache.local.clear()
+        object_cache.usernames.current()
+        object_cache.group_slugs.current()
+        self.guest_client = Client()
+
+    def test_unknown_names_are_rejected_without_queries(self):
+        """Пробы несуществующих адресов не доходят до БД."""
+        urls = ('/wp-login.php/', '/favicon.ico/', '/unknown/1/',
+                reverse('group', kwargs={'slug': 'unknown'}))
+        for url in urls:
+            with self.subTest(url=url), self.assertNumQueries(0):
+                response = self.guest_client.get(url)
+
+                self.assertEqual(response.status_code, 404)
+
+    def test_new_names_are_found(self):
+        """Новый пользователь и новая группа сразу находятся."""
+        User.objects.create_user(username='newcomer')
+        Group.objects.create(title='New group', slug='new-group')
+
+        self.assertEqual(
+            self.guest_client.get('/newcomer/').status_code, 200
+        )
+        self.assertEqual(
+            self.guest_client.get(
+                reverse('group', kwargs={'slug': 'new-group'})
+            ).status_code, 200
+        )
+
+    def test_new_name_is_added_without_rebuild(self):
+        """Регистрация дописывает имя в фильтр, а не перестраивает его."""
+        generation = object_cache.usernames.generation()
+        with commit_callbacks():
+            User.objects.create_user(username='newcomer')
+        # Другой процесс ещё не видел фильтра этого поколения.
+        object_cache.usernames._current = (None, None)
+
+        with self.assertNumQueries(0):
+            self.assertIn('newcomer', object_cache.usernames)
+            self.assertIn('author', object_cache.usernames)
+        self.assertEqual(object_cache.usernames.generation(), generation + 1)
+
+    def test_missing_name_is_cached(self):
+        """Имя, прошедшее фильтр, но отсутствующее в БД, кешируется."""
+        User.objects.filter(username='author').delete()
+
+        with self.assertRaises(Http404):
+            object_cache.get_user('author')
+        with self.assertNumQueries(0), self.assertRaises(Http404):
+            object_cache.get_user('author')
+
+
+class BloomFilterTests(SimpleTestCase):
+    def test_no_false_negatives(self):
+        """Добавленные значения всегда находятся, чужие - редко."""
+        names = [f'user_{i}' for i in range(5000)]
+        bloom = BloomFilter.from_items(names, 0.01)
+
+        self.assertTrue(all(name in bloom for name in names))
+        false_positives = sum(f'other_{i}' in bloom for i in range(5000))
+        self.assertLess(false_positives, 5000 * 0.02)
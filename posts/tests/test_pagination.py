@@ -0,0 +1,95 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Group, Post
+from posts.pagination import CursorPage
+
+User = get_user_model()
+
+
+@override_settings(POSTS_PAGINATION='cursor')
+class CursorPaginationTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test_user')
+        cls.group = Group.objects.create(
+            title='Test group',
+            slug='test-group',
+        )
+        Post.objects.bulk_create([
+            Post(text=f'Text {i}', author=cls.user, group=cls.group)
+            for i in range(25)
+        ])
+        cls.urls = [
+            reverse('index'),
+            reverse('group', kwargs={'slug': cls.group.slug}),
+            reverse('profile', kwargs={'username': cls.user.username}),
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def test_cursor_pages_cover_feed_without_duplicates(self):
+        """Переход по next-курсорам проходит всю ленту без повторов."""
+        expected = list(
+            Post.objects.order_by('-pub_date', '-pk').values_list(
+                'pk', flat=True
+            )
+        )
+
+        for url in CursorPaginationTests.urls:
+            with self.subTest(url=url):
+                seen = []
+                response = self.guest_client.get(url)
+                while True:
+                    page = response.context['page']
+                    self.assertIsInstance(page, CursorPage)
+                    seen.extend(post.pk for post in page)
+                    if not page.has_next():
+                        break
+                    response = self.guest_client.get(
+                        url, {'cursor': page.next_cursor}
+                    )
+
+                self.assertEqual(seen, expected)
+
+    def test_previous_cursor_returns_previous_page(self):
+        """previous-курсор возвращает на предыдущую страницу."""
+        url = CursorPaginationTests.urls[1]
+        first_page = self.guest_client.get(url).context['page']
+        second_page = self.guest_client.get(
+            url, {'cursor': first_page.next_cursor}
+        ).context['page']
+
+        response = self.guest_client.get(
+            url, {'cursor': second_page.previous_cursor}
+        )
+        page = response.context['page']
+
+        self.assertEqual(list(page), list(first_page))
+        self.assertFalse(page.has_previous())
+
+    def test_page_number_links_still_work(self):
+        """Старые ссылки ?page=N отдают классическую страницу."""
+        url = CursorPaginationTests.urls[1]
+
+        response = self.guest_client.get(url, {'page': 3})
+        page = response.context['page']
+
+        self.assertNotIsInstance(page, CursorPage)
+        self.assertEqual(page.number, 3)
+        self.assertEqual(len(page), 5)
+
+    def test_invalid_cursor_returns_first_page(self):
+        """Битый токен курсора отдаёт первую страницу."""
+        url = CursorPaginationTests.urls[1]
+
+        response = self.guest_client.get(url, {'cursor': 'not-a-token'})
+        page = response.context['page']
+
+        self.assertEqual(len(page), 10)
+        self.assertFalse(page.has_previous())
@@ -0,0 +1,74 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts import object_cache
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class QueryBudgetTests(TestCase):
+    """Число SQL-запросов страниц не зависит от числа постов на них."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(title='Test group',
+                                         slug='test-group')
+        cls.authors = [
+            User.objects.create_user(username=f'author_{i}')
+            for i in range(3)
+        ]
+        for author in cls.authors:
+            Follow.objects.create(user=cls.reader, author=author)
+        for i in range(12):
+            post = Post.objects.create(text=f'Text {i}',
+                                       author=cls.authors[i % 3],
+                                       group=cls.group)
+        for author in cls.authors:
+            Comment.objects.create(text='Comment', author=author, post=post)
+        cls.post = post
+        # Сессия и пользователь берутся из кеша и запросов не добавляют.
+        # Профиль и лента подписок читают ещё рекомендации читателя.
+        cls.budgets = {
+            reverse('index'): 2,
+            reverse('group', kwargs={'slug': cls.group.slug}): 3,
+            reverse('profile', kwargs={'username': post.author.username}): 6,
+            reverse('post', kwargs={'username': post.author.username,
+                                    'post_id': post.id}): 4,
+            reverse('follow_index'): 3,
+        }
+
+    def setUp(self):
+        self.reader_client = Client()
+        self.reset_caches()
+
+    def reset_caches(self):
+        """Пустые кеши, кроме сессии, пользователя и фильтров имён."""
+        cache.clear()
+        object_cache.local.clear()
+        object_cache.usernames.current()
+        object_cache.group_slugs.current()
+        self.reader_client.force_login(QueryBudgetTests.reader)
+        object_cache.get_user_by_id(QueryBudgetTests.reader.pk)
+
+    def test_pages_fit_query_budget(self):
+        """Страницы укладываются в свой бюджет SQL-запросов."""
+        for url, budget in QueryBudgetTests.budgets.items():
+            with self.subTest(url=url), self.assertNumQueries(budget):
+                self.reader_client.get(url)
+
+    def test_budget_does_not_grow_with_page_size(self):
+        """Дополнительные посты не добавляют запросов."""
+        for i in range(5):
+            Post.objects.create(text=f'Extra {i}',
+                                author=QueryBudgetTests.authors[i % 3],
+                                group=QueryBudgetTests.group)
+
+        for url, budget in QueryBudgetTests.budgets.items():
+            self.reset_caches()
+            with self.subTest(url=url), self.assertNumQueries(budget):
+                self.reader_client.get(url)
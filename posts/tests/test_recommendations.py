@@ -0,0 +1,102 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts import recommendations
+from posts.models import Follow, StaleSuggestions
+
+User = get_user_model()
+
+
+def scores(user):
+    return [(suggestion.author.username, suggestion.score)
+            for suggestion in recommendations.suggestions_for(user)]
+
+
+class RecommendationTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        names = ('reader', 'friend_1', 'friend_2', 'author_1', 'author_2',
+                 'author_3')
+        cls.users = {name: User.objects.create_user(username=name)
+                     for name in names}
+        for user, author in (('reader', 'friend_1'),
+                             ('reader', 'friend_2'),
+                             ('friend_1', 'author_1'),
+                             ('friend_1', 'author_2'),
+                             ('friend_2', 'author_1'),
+                             ('friend_2', 'reader')):
+            Follow.objects.create(user=cls.users[user],
+                                  author=cls.users[author])
+
+    def setUp(self):
+        cache.clear()
+
+    def follow(self, user, author):
+        Follow.add(RecommendationTests.users[user].pk,
+                   RecommendationTests.users[author].pk)
+
+    def test_friends_of_friends_scores(self):
+        """Автор получает по очку за каждую подписку, которая его читает;
+        себя и уже прочитанных авторов не советуем."""
+        recommendations.refresh(full=True)
+
+        self.assertEqual(scores(RecommendationTests.users['reader']),
+                         [('author_1', 2), ('author_2', 1)])
+        self.assertEqual(scores(RecommendationTests.users['friend_2']),
+                         [('friend_1', 1)])
+        self.assertFalse(StaleSuggestions.objects.exists())
+
+    def test_incremental_refresh(self):
+        """Новая подписка друга пересчитывает и его подписчиков."""
+        recommendations.refresh(full=True)
+        self.follow('friend_2', 'author_3')
+
+        refreshed = recommendations.refresh()
+
+        # friend_2 и его подписчик reader.
+        self.assertEqual(refreshed, 2)
+        self.assertEqual(scores(RecommendationTests.users['reader']),
+                         [('author_1', 2), ('author_2', 1), ('author_3', 1)])
+        self.assertEqual(recommendations.refresh(), 0)
+
+    def test_followed_author_hidden_before_refresh(self):
+        """Только что прочитанный автор сразу пропадает из рекомендаций."""
+        recommendations.refresh(full=True)
+        self.follow('reader', 'author_1')
+
+        self.assertEqual(scores(RecommendationTests.users['reader']),
+                         [('author_2', 1)])
+
+    def test_pages_show_suggestions(self):
+        """Профиль и лента подписок показывают рекомендации читателя."""
+        recommendations.refresh(full=True)
+        client = Client()
+        client.force_login(RecommendationTests.users['reader'])
+
+        for url in (reverse('follow_index'),
+                    reverse('profile', kwargs={'username': 'friend_1'})):
+            with self.subTest(url=url):
+                response = client.get(url)
+
+                self.assertContains(response, 'Кого читать')
+                self.assertContains(response, '@author_1')
+
+    def test_sparse_scorer_matches_python(self):
+        """Матричный расчёт совпадает с расчётом на множествах."""
+        edges = recommendations.load_edges()
+        user_ids = [user.pk for user in RecommendationTests.users.values()]
+
+        self.assertEqual(
+            recommendations.SparseScorer(*edges).top(user_ids, 10),
+            recommendations.PythonScorer(*edges).top(user_ids, 10),
+        )
+
+    def test_sparse_scorer_is_default(self):
+        """С numpy и scipy из requirements.txt считает SparseScorer."""
+        self.assertIsInstance(
+            recommendations.make_scorer(*recommendations.load_edges()),
+            recommendations.SparseScorer,
+        )
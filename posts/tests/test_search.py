@@ -0,0 +1,111 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Group, Post
+from posts.search import match_query
+
+User = get_user_model()
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass'
+        )
+        cls.group = Group.objects.create(title='Котики', slug='cats')
+        cls.best = Post.objects.create(text='Котлета, котлета и котлета',
+                                       author=cls.author)
+        cls.other = Post.objects.create(text='Рецепт: <b>котлета</b>',
+                                        author=cls.author)
+        cls.in_group = Post.objects.create(text='Без слова',
+                                           author=cls.author, group=cls.group)
+        cls.miss = Post.objects.create(text='Про погоду', author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def found(self, query, **params):
+        response = self.client.get(reverse('search'), {'q': query, **params})
+        return response, [post.pk for post in response.context['page']]
+
+    def test_match_query_ignores_fts_syntax(self):
+        """Операторы FTS5 и кавычки в запросе - просто слова."""
+        self.assertEqual(match_query('кот" OR NEAR(a'),
+                         '"кот"* "OR"* "NEAR"* "a"*')
+        self.assertEqual(match_query('"*:'), '')
+
+    def test_ranked_prefix_search(self):
+        """Ищется по префиксу без учёта регистра, лучшие совпадения выше."""
+        _, found = self.found('КОТЛ')
+
+        self.assertEqual(found, [SearchTests.best.pk, SearchTests.other.pk])
+
+    def test_group_title_is_indexed(self):
+        """Название группы ищется и меняется вместе с группой."""
+        self.assertEqual(self.found('котики')[1], [SearchTests.in_group.pk])
+
+        Group.objects.filter(pk=SearchTests.group.pk).update(title='Собаки')
+
+        self.assertEqual(self.found('котики')[1], [])
+        self.assertEqual(self.found('собаки')[1], [SearchTests.in_group.pk])
+
+    def test_index_follows_edits_and_deletes(self):
+        """Триггеры переиндексируют изменённые и убирают удалённые посты."""
+        Post.objects.filter(pk=SearchTests.miss.pk).update(text='Котлеты')
+        Post.objects.filter(pk=SearchTests.other.pk).delete()
+
+        self.assertEqual(self.found('котлет')[1],
+                         [SearchTests.best.pk, SearchTests.miss.pk])
+
+    def test_snippet_is_highlighted_and_escaped(self):
+        """Совпадения выделены <mark>, HTML из текста экранирован."""
+        response, _ = self.found('рецепт')
+
+        self.assertContains(
+            response, '<mark>Рецепт</mark>: &lt;b&gt;котлета&lt;/b&gt;'
+        )
+
+    @override_settings(POSTS_PER_PAGE=1)
+    def test_cursor_pagination(self):
+        """Курсоры ведут по результатам вперёд и назад без повторов."""
+        first, found = self.found('котлета')
+        cursor = first.context['page'].next_cursor
+        second, second_found = self.found('котлета', cursor=cursor)
+        back, back_found = self.found(
+            'котлета', cursor=second.context['page'].previous_cursor
+        )
+
+        self.assertEqual(found + second_found,
+                         [SearchTests.best.pk, SearchTests.other.pk])
+        self.assertContains(first, f'cursor={cursor}')
+        self.assertEqual(back_found, found)
+
+    def test_empty_query(self):
+        """Пустой запрос ничего не ищет."""
+        response = self.client.get(reverse('search'), {'q': ' '})
+
+        self.assertIsNone(response.context['page'])
+
+    def test_admin_search_uses_index(self):
+        """Поиск в админке идёт через FTS5, а не LIKE."""
+        self.client.force_login(SearchTests.admin)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('admin:posts_post_changelist'),
+                                       {'q': 'котлета'})
+
+        sql = ' '.join(query['sql'] for query in queries.captured_queries)
+        self.assertIn('posts_post_search MATCH', sql)
+        self.assertNotIn('LIKE', sql)
+        self.assertEqual(
+            {post.pk for post in response.context['cl'].result_list},
+            {SearchTests.best.pk, SearchTests.other.pk},
+        )
@@ -0,0 +1,105 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts import object_cache
+from posts.sessions import SessionStore
+
+User = get_user_model()
+
+
+class CachedSessionTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test_user',
+                                            password='Old-pass-123')
+
+    def setUp(self):
+        cache.clear()
+        object_cache.local.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(CachedSessionTests.user)
+
+    def test_session_and_user_come_from_cache(self):
+        """Повторный запрос не читает из БД ни сессию, ни пользователя."""
+        url = reverse('about:author')
+        self.authorized_client.get(url)
+
+        with self.assertNumQueries(0):
+            response = self.authorized_client.get(url)
+
+        self.assertEqual(response.context['user'], CachedSessionTests.user)
+
+    def test_sessions_of_old_backend_stay_valid(self):
+        """Сессия с путём ModelBackend после перехода не разлогинивается."""
+        client = Client()
+        client.force_login(CachedSessionTests.user,
+                           'django.contrib.auth.backends.ModelBackend')
+
+        response = client.get(reverse('about:author'))
+
+        self.assertEqual(response.context['user'], CachedSessionTests.user)
+
+    def test_changes_are_written_through(self):
+        """Изменения - сразу в БД, сохранение без изменений - только в кеш."""
+        session = SessionStore()
+        session['value'] = 1
+        session.create()
+        key = session.session_key
+
+        session = SessionStore(key)
+        session['value'] = 2
+        session.save()
+        cache.clear()
+        self.assertEqual(SessionStore(key)['value'], 2)
+
+        session = SessionStore(key)
+        session.load()
+        with self.assertNumQueries(0):
+            session.save()
+
+        with override_settings(SESSION_WRITE_BEHIND=0), \
+                CaptureQueriesContext(connection) as queries:
+            session.save()
+        self.assertTrue(any('django_session' in query['sql']
+                            for query in queries.captured_queries))
+
+    def test_login_is_written_to_db_immediately(self):
+        """Вход сохраняется в БД сразу и переживает потерю кеша."""
+        cache.clear()
+
+        response = self.authorized_client.get(reverse('about:author'))
+
+        self.assertTrue(response.context['user'].is_authenticated)
+
+    def test_password_change_logs_out_other_sessions(self):
+        """Смена пароля выкидывает остальные сессии пользователя."""
+        other_client = Client()
+        other_client.force_login(CachedSessionTests.user)
+        other_client.get(reverse('about:author'))
+
+        self.authorized_client.post(reverse('password_change'), {
+            'old_password': 'Old-pass-123',
+            'new_password1': 'New-pass-456',
+            'new_password2': 'New-pass-456',
+        })
+
+        self.assertTrue(self.authorized_client.get(
+            reverse('about:author')
+        ).context['user'].is_authenticated)
+        self.assertFalse(other_client.get(
+            reverse('about:author')
+        ).context['user'].is_authenticated)
+
+    def test_logout_deletes_cached_session(self):
+        """После выхода старый ключ сессии не действует."""
+        key = self.authorized_client.session.session_key
+
+        self.authorized_client.get(reverse('logout'))
+
+        self.assertFalse(SessionStore().exists(key))
+        self.assertEqual(SessionStore(key).load(), {})
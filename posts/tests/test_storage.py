@@ -0,0 +1,117 @@
+import hashlib
+import os
+import shutil
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+
+from posts import thumbnails
+from posts.models import Post, StoredImage
+
+User = get_user_model()
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x01\x00'
+    b'\x01\x00\x00\x00\x00\x21\xf9\x04'
+    b'\x01\x0a\x00\x01\x00\x2c\x00\x00'
+    b'\x00\x00\x01\x00\x01\x00\x00\x02'
+    b'\x02\x4c\x01\x00\x3b'
+)
+DIGEST = hashlib.sha256(SMALL_GIF).hexdigest()
+NAME = f'posts/{DIGEST[:2]}/{DIGEST}.gif'
+
+
+@override_settings(MEDIA_ROOT=os.path.join(settings.BASE_DIR,
+                                           'temp_storage_test'))
+class ContentAddressedStorageTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test_user')
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def create_post(self, name='meme.GIF'):
+        return Post.objects.create(
+            text='Text', author=ContentAddressedStorageTests.user,
+            image=SimpleUploadedFile(name, SMALL_GIF,
+                                     content_type='image/gif'),
+        )
+
+    def test_duplicates_share_one_file(self):
+        """Одинаковое содержимое хранится одним файлом под своим хешем."""
+        first = default_storage.save('posts/a.gif', ContentFile(SMALL_GIF))
+        second = default_storage.save('posts/b.gif', ContentFile(SMALL_GIF))
+
+        self.assertEqual(first, NAME)
+        self.assertEqual(second, NAME)
+        self.assertEqual(os.listdir(os.path.dirname(
+            default_storage.path(NAME)
+        )), [f'{DIGEST}.gif'])
+
+    def test_posts_count_references(self):
+        """Файл удаляется вместе с последним ссылающимся постом."""
+        posts = [self.create_post(), self.create_post('copy.gif')]
+
+        self.assertEqual(StoredImage.objects.get(name=NAME).references, 2)
+
+        posts[0].delete()
+        StoredImage.delete_unused(NAME)
+        self.assertTrue(default_storage.exists(NAME))
+
+        posts[1].delete()
+        StoredImage.delete_unused(NAME)
+        self.assertFalse(default_storage.exists(NAME))
+        self.assertFalse(StoredImage.objects.filter(name=NAME).exists())
+
+    def test_upload_during_delete_keeps_file(self):
+        """Файл, удалённый между загрузкой дубликата и acquire, вернётся."""
+        self.create_post().delete()
+        acquire = StoredImage.acquire
+
+        def late_acquire(name, content=None):
+            StoredImage.delete_unused(name)
+            acquire(name, content)
+
+        with mock.patch.object(StoredImage, 'acquire', late_acquire):
+            self.create_post()
+
+        self.assertTrue(default_storage.exists(NAME))
+        self.assertEqual(StoredImage.objects.get(name=NAME).references, 1)
+
+    def test_replaced_image_is_released(self):
+        """Замена изображения поста снимает ссылку на прежний файл."""
+        post = self.create_post()
+
+        post.image = SimpleUploadedFile('other.gif', SMALL_GIF + b'\x00',
+                                        content_type='image/gif')
+        post.save()
+
+        self.assertEqual(StoredImage.objects.get(name=NAME).references, 0)
+        self.assertEqual(
+            StoredImage.objects.get(name=post.image.name).references, 1
+        )
+
+    @override_settings(CARD_THUMBNAIL_WORKERS=0)
+    def test_duplicates_share_thumbnails(self):
+        """Миниатюры одного файла создаются один раз на все посты."""
+        first = self.create_post()
+        thumbnails.schedule(first)
+        second = self.create_post()
+
+        variants = thumbnails.ready_variants(second.image)
+
+        self.assertIsNotNone(variants)
+        self.assertEqual(
+            [thumbnail.url for _, thumbnail in variants['WEBP']],
+            [thumbnail.url for _, thumbnail
+             in thumbnails.ready_variants(first.image)['WEBP']],
+        )
@@ -0,0 +1,220 @@
+import os
+import shutil
+from concurrent.futures.process import BrokenProcessPool
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from sorl.thumbnail import get_thumbnail
+from sorl.thumbnail.conf import settings as thumbnail_settings
+
+from posts import sorl_internals, thumbnails
+from posts.models import Post
+from posts.templatetags import post_cards
+
+User = get_user_model()
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x01\x00'
+    b'\x01\x00\x00\x00\x00\x21\xf9\x04'
+    b'\x01\x0a\x00\x01\x00\x2c\x00\x00'
+    b'\x00\x00\x01\x00\x01\x00\x00\x02'
+    b'\x02\x4c\x01\x00\x3b'
+)
+
+
+def ready(post):
+    return thumbnails.ready_variants(post.image)
+
+
+@override_settings(MEDIA_ROOT=os.path.join(settings.BASE_DIR,
+                                           'temp_thumbnails_test'))
+class CardThumbnailTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test_user')
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(CardThumbnailTests.user)
+
+    def upload(self, name):
+        self.authorized_client.post(reverse('new_post'), data={
+            'text': name,
+            'image': SimpleUploadedFile(name=f'{name}.gif',
+                                        content=SMALL_GIF,
+                                        content_type='image/gif'),
+        })
+        return Post.objects.get(text=name)
+
+    @override_settings(CARD_THUMBNAIL_WORKERS=0)
+    def test_thumbnail_created_on_upload(self):
+        """Без пула варианты создаются при сохранении поста, а карточка
+        получает srcset из всех ширин JPEG и WebP."""
+        post = self.upload('inline')
+        variants = ready(post)
+
+        self.assertIsNotNone(variants)
+        response = self.authorized_client.get(reverse('index'))
+        self.assertContains(response, 'type="image/webp"')
+        for format_, extension in (('JPEG', '.jpg'), ('WEBP', '.webp')):
+            widths = [width for width, _ in variants[format_]]
+            self.assertEqual(widths, list(thumbnails.CARD_WIDTHS))
+            for width, thumbnail in variants[format_]:
+                self.assertTrue(thumbnail.url.endswith(extension))
+                self.assertEqual(thumbnail.width, width)
+                self.assertContains(response, f'{thumbnail.url} {width}w')
+
+    def test_page_thumbnails_resolved_in_one_query(self):
+        """Миниатюры всех карточек страницы ищутся одним запросом к БД."""
+        for i in range(3):
+            post = Post.objects.create(
+                text=f'Text {i}', author=CardThumbnailTests.user,
+                image=SimpleUploadedFile(f'{i}.gif', SMALL_GIF + bytes([i]),
+                                         content_type='image/gif'),
+            )
+            thumbnails.generate(post.pk)
+        cache.clear()
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.authorized_client.get(reverse('index'))
+
+        kvstore_queries = [query for query in queries.captured_queries
+                           if 'thumbnail_kvstore' in query['sql']]
+        self.assertEqual(len(kvstore_queries), 1)
+        self.assertEqual(response.content.count(b'<picture>'), 3)
+
+    def test_card_shows_original_until_ready(self):
+        """Пока миниатюра в очереди, карточка показывает оригинал,
+        а чтение страницы не создаёт миниатюру."""
+        post = self.upload('queued')
+
+        response = self.authorized_client.get(reverse('index'))
+
+        self.assertContains(response, post.image.url)
+        self.assertIsNone(ready(post))
+
+    def test_waiting_card_expires_with_queue_mark(self):
+        """Карточка без миниатюр кешируется до конца отметки очереди:
+        потерянная задача пула ставится снова, а не ждёт сутки."""
+        post = self.upload('lost')
+
+        with mock.patch.object(post_cards.cache, 'set_many',
+                               wraps=cache.set_many) as set_many:
+            self.authorized_client.get(reverse('index'))
+
+        self.assertEqual(set_many.call_count, 1)
+        cards, timeout = set_many.call_args[0]
+        self.assertEqual(timeout, settings.CARD_THUMBNAIL_QUEUE_TIMEOUT)
+        self.assertTrue(all(key.startswith(f'post_card:{post.pk}:')
+                            for key in cards))
+
+    def test_names_match_get_thumbnail(self):
+        """thumbnail_file называет миниатюры так же, как get_thumbnail."""
+        post = self.upload('names')
+        for preserve in (False, True):
+            # sorl копирует настройки при первом обращении.
+            with self.subTest(preserve=preserve), mock.patch.object(
+                    thumbnail_settings, 'THUMBNAIL_PRESERVE_FORMAT',
+                    preserve):
+                for _, _, geometry, options in thumbnails.card_variants():
+                    self.assertEqual(
+                        thumbnails.thumbnail_file(post.image, geometry,
+                                                  **options).name,
+                        get_thumbnail(post.image, geometry, **options).name,
+                    )
+                self.assertEqual(
+                    thumbnails.thumbnail_file(post.image, '10x10').name,
+                    get_thumbnail(post.image, '10x10').name,
+                )
+
+    def test_other_sorl_version_warns(self):
+        """Версия sorl не та, с которой сверен posts.sorl_internals."""
+        self.assertEqual(sorl_internals.check_sorl_version(None), [])
+
+        with mock.patch.object(sorl_internals.metadata, 'version',
+                               return_value='13.0'):
+            warnings = sorl_internals.check_sorl_version(None)
+
+        self.assertEqual([warning.id for warning in warnings],
+                         ['posts.W001'])
+
+    def test_generate_bumps_post_version(self):
+        """Готовая миниатюра меняет updated: карточка перерисуется."""
+        post = self.upload('version')
+
+        thumbnails.generate(post.pk)
+
+        self.assertIsNotNone(ready(post))
+        post_after = Post.objects.get(pk=post.pk)
+        self.assertGreater(post_after.updated, post.updated)
+
+    def test_broken_pool_generates_inline(self):
+        """Если пул недоступен, миниатюра создаётся в процессе запроса."""
+        post = self.upload('broken')
+        executor = mock.Mock()
+        executor.submit.side_effect = BrokenProcessPool
+
+        with mock.patch.object(thumbnails, '_executor', executor), \
+                self.assertLogs('posts.thumbnails', 'ERROR'):
+            thumbnails._submit(post.pk)
+            self.assertIsNone(thumbnails._executor)
+
+        self.assertIsNotNone(ready(post))
+
+
+@override_settings(MEDIA_ROOT=os.path.join(settings.BASE_DIR,
+                                           'temp_thumbnails_test'))
+class BackfillThumbnailsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test_user')
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        self.posts = [
+            Post.objects.create(
+                text=f'Text {i}', author=BackfillThumbnailsTests.user,
+                image=SimpleUploadedFile(f'old{i}.gif', SMALL_GIF,
+                                         content_type='image/gif'),
+            )
+            for i in range(3)
+        ]
+
+    def test_backfill_builds_missing_variants(self):
+        """Команда создаёт варианты старых изображений и обновляет посты."""
+        out = StringIO()
+
+        call_command('backfill_thumbnails', workers=0, batch_size=2,
+                     stdout=out)
+
+        for post in self.posts:
+            self.assertIsNotNone(ready(post))
+            self.assertGreater(Post.objects.get(pk=post.pk).updated,
+                               post.updated)
+        self.assertIn('Создано: 3', out.getvalue())
+
+        call_command('backfill_thumbnails', workers=0, stdout=out)
+
+        self.assertIn('уже были готовы: 3', out.getvalue())
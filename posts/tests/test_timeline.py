@@ -0,0 +1,99 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts import timeline
+from posts.models import Follow, Post, TimelineEntry
+from posts.tests.utils import commit_callbacks
+
+User = get_user_model()
+
+
+class TimelineTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.follower = User.objects.create_user(username='follower')
+        cls.stranger = User.objects.create_user(username='stranger')
+        cls.old_post = Post.objects.create(text='Old post',
+                                           author=cls.author)
+
+    def setUp(self):
+        self.follower_client = Client()
+        self.follower_client.force_login(TimelineTests.follower)
+
+    def timeline_posts(self, user):
+        return list(
+            TimelineEntry.objects.filter(user=user).values_list(
+                'post_id', flat=True
+            )
+        )
+
+    def test_follow_backfills_timeline(self):
+        """Подписка добавляет в ленту уже опубликованные посты."""
+        self.follower_client.get(
+            reverse('profile_follow',
+                    kwargs={'username': TimelineTests.author.username})
+        )
+
+        self.assertEqual(self.timeline_posts(TimelineTests.follower),
+                         [TimelineTests.old_post.id])
+
+    def test_new_post_fans_out_to_followers(self):
+        """Новый пост попадает только в ленты подписчиков."""
+        Follow.objects.create(user=TimelineTests.follower,
+                              author=TimelineTests.author)
+        author_client = Client()
+        author_client.force_login(TimelineTests.author)
+
+        author_client.post(reverse('new_post'), data={'text': 'New post'})
+        new_post = Post.objects.get(text='New post')
+
+        self.assertIn(new_post.id,
+                      self.timeline_posts(TimelineTests.follower))
+        self.assertEqual(self.timeline_posts(TimelineTests.stranger), [])
+        self.assertEqual(self.timeline_posts(TimelineTests.author), [])
+
+    def test_unfollow_prunes_timeline(self):
+        """Отписка убирает посты автора из ленты."""
+        Follow.objects.create(user=TimelineTests.follower,
+                              author=TimelineTests.author)
+
+        self.follower_client.get(
+            reverse('profile_unfollow',
+                    kwargs={'username': TimelineTests.author.username})
+        )
+        response = self.follower_client.get(reverse('follow_index'))
+
+        self.assertEqual(self.timeline_posts(TimelineTests.follower), [])
+        self.assertEqual(len(response.context['page']), 0)
+
+    @override_settings(TIMELINE_FANOUT_WORKERS=2)
+    def test_pool_runs_after_commit(self):
+        """С пулом раскладка уходит в поток только после коммита."""
+        executor = mock.Mock()
+
+        with mock.patch.object(timeline, '_executor', executor):
+            with commit_callbacks():
+                Post.objects.create(text='Pooled', author=TimelineTests.author)
+                executor.submit.assert_not_called()
+
+        executor.submit.assert_called_once_with(
+            timeline._run_in_thread, timeline.fan_out_post,
+            Post.objects.get(text='Pooled').pk,
+        )
+
+    def test_pool_task_errors_are_logged(self):
+        """Ошибка задачи пула попадает в лог, а не теряется в Future."""
+        def fail(post_id):
+            raise RuntimeError('database is locked')
+
+        # Соединение теста закрывать нельзя: оно держит его транзакцию.
+        with self.assertLogs('posts.timeline', 'ERROR'), \
+                mock.patch.object(timeline.connection, 'close') as close:
+            timeline._run_in_thread(fail, 1)
+
+        close.assert_called_once_with()
@@ -0,0 +1,88 @@
+from io import BytesIO
+from unittest import mock
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from PIL import Image, ImageOps
+
+from posts.forms import PostForm
+
+
+def image_file(name, size, image_format, exif=None):
+    buffer = BytesIO()
+    image = Image.new('RGB', size, (200, 30, 30))
+    if exif is not None:
+        image.save(buffer, image_format, exif=exif)
+    else:
+        image.save(buffer, image_format)
+    return SimpleUploadedFile(name, buffer.getvalue(),
+                              content_type=Image.MIME[image_format])
+
+
+def photo_exif():
+    exif = Image.Exif()
+    exif[0x0112] = 6  # повернуть на 90° по часовой стрелке
+    exif[0x0110] = 'Test camera'
+    return exif.tobytes()
+
+
+@override_settings(IMAGE_UPLOAD_MAX_SIDE=100,
+                   IMAGE_UPLOAD_MAX_PIXELS=200 * 200)
+class PrepareImageTests(TestCase):
+    def clean(self, upload):
+        form = PostForm(data={'text': 'Text'}, files={'image': upload})
+        form.is_valid()
+        return form
+
+    def test_photo_is_rotated_downscaled_and_stripped(self):
+        """Фото поворачивается по EXIF, уменьшается и теряет метаданные."""
+        form = self.clean(image_file('photo.jpeg', (400, 200), 'JPEG',
+                                     photo_exif()))
+
+        image = form.cleaned_data['image']
+        self.assertEqual(image.name, 'photo.jpg')
+        with Image.open(image) as result:
+            self.assertEqual(result.size, (50, 100))
+            self.assertEqual(len(result.getexif()), 0)
+
+    def test_jpeg_is_decoded_in_draft_mode(self):
+        """Большой JPEG декодируется сразу в уменьшенном размере."""
+        with mock.patch('posts.uploads.ImageOps.exif_transpose',
+                        wraps=ImageOps.exif_transpose) as transpose:
+            self.clean(image_file('big.jpg', (1600, 1600), 'JPEG'))
+
+        decoded = transpose.call_args[0][0]
+        self.assertLessEqual(max(decoded.size), 2 * 100)
+
+    def test_small_non_photo_is_kept(self):
+        """Небольшие GIF и PNG сохраняются без перекодирования."""
+        upload = image_file('small.gif', (50, 50), 'GIF')
+
+        form = self.clean(upload)
+
+        self.assertIs(form.cleaned_data['image'], upload)
+
+    def test_large_png_is_downscaled(self):
+        """Большой PNG уменьшается с сохранением формата."""
+        form = self.clean(image_file('wide.png', (200, 100), 'PNG'))
+
+        with Image.open(form.cleaned_data['image']) as result:
+            self.assertEqual((result.format, result.size), ('PNG', (100, 50)))
+
+    def test_too_many_pixels_rejected(self):
+        """PNG больше IMAGE_UPLOAD_MAX_PIXELS не декодируется."""
+        form = self.clean(image_file('huge.png', (300, 300), 'PNG'))
+
+        self.assertIn('image', form.errors)
+
+    def test_truncated_jpeg_rejected(self):
+        """Обрезанный JPEG - ошибка формы, а не исключение."""
+        upload = image_file('broken.jpg', (400, 400), 'JPEG')
+        content = upload.read()
+        upload = SimpleUploadedFile('broken.jpg', content[:len(content) // 2],
+                                    content_type='image/jpeg')
+
+        form = self.clean(upload)
+
+        self.assertEqual(form.errors.as_data()['image'][0].code,
+                         'invalid_image')
@@ -0,0 +1,21 @@
+from contextlib import contextmanager
+
+from django.db import connection
+
+
+@contextmanager
+def commit_callbacks():
+    """Выполняет on_commit-колбэки, зарегистрированные внутри блока.
+
+    TestCase не коммитит транзакцию, и колбэки иначе не запустились бы.
+    Аналог captureOnCommitCallbacks(execute=True) из Django 3.2.
+    """
+    start = len(connection.run_on_commit)
+    try:
+        yield
+    finally:
+        while len(connection.run_on_commit) > start:
+            callbacks = connection.run_on_commit[start:]
+            del connection.run_on_commit[start:]
+            for _, callback in callbacks:
+                callback()
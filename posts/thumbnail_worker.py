@@ -0,0 +1,31 @@
+"""Точки входа процессов пула миниатюр (posts.thumbnails).
+
+Модуль не импортирует модели: spawn-процесс распаковывает задачу раньше,
+чем выполнит initializer, а модели до django.setup() недоступны.
+"""
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def setup():
+    import django
+    django.setup()
+
+
+def generate(post_id):
+    from .thumbnails import generate
+    try:
+        generate(post_id)
+    except Exception:
+        logger.exception('Не удалось создать миниатюру поста %s', post_id)
+
+
+def build(post_id):
+    """Варианты без обновления страниц - для пачек backfill_thumbnails."""
+    from .thumbnails import build_variants
+    try:
+        return build_variants(post_id)
+    except Exception:
+        logger.exception('Не удалось создать миниатюру поста %s', post_id)
+        return False
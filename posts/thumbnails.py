@@ -0,0 +1,181 @@
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.images import ImageFile
+
+from . import object_cache, sorl_internals, thumbnail_worker
+from .caching import bump_feed_generation
+from .models import Post
+from .page_cache import purge
+
+logger = logging.getLogger(__name__)
+
+# Ширины вариантов карточки; высота - в пропорции 960x339.
+CARD_WIDTHS = (320, 640, 960)
+CARD_HEIGHT_RATIO = 339 / 960
+# WebP для браузеров, которые его понимают, JPEG - для остальных.
+CARD_FORMATS = ('WEBP', 'JPEG')
+CARD_OPTIONS = {'crop': 'center', 'upscale': True}
+# Ширина карточки в макете: на всю ширину экрана на телефонах.
+CARD_SIZES = '(max-width: 992px) 100vw, 960px'
+
+_executor = None
+
+
+def card_variants():
+    """(формат, ширина, геометрия, опции sorl) всех вариантов карточки."""
+    return [
+        (format_, width, f'{width}x{round(width * CARD_HEIGHT_RATIO)}',
+         {**CARD_OPTIONS, 'format': format_})
+        for format_ in CARD_FORMATS for width in CARD_WIDTHS
+    ]
+
+
+def thumbnail_file(file_, geometry_string, **options):
+    """ImageFile миниатюры sorl без обращения к хранилищу и kvstore.
+
+    Имя - то же, что дал бы get_thumbnail (см. posts.sorl_internals).
+    """
+    source = ImageFile(file_)
+    name = sorl_internals.thumbnail_name(source, geometry_string, options)
+    return ImageFile(name, default.storage)
+
+
+def ready_thumbnails(files):
+    """Готовые миниатюры из kvstore (или None) в порядке files.
+
+    В отличие от get_thumbnail, никогда не создаёт их.
+    """
+    if not files:
+        return []
+    return sorl_internals.kvstore_get_many(default.kvstore, files)
+
+
+def ready_variants_many(images):
+    """Для каждого изображения {формат: [(ширина, миниатюра)]} или None,
+    если готовы не все варианты; все изображения - за один проход."""
+    variants = card_variants()
+    files = [thumbnail_file(image, geometry, **options)
+             for image in images for _, _, geometry, options in variants]
+    thumbnails = iter(ready_thumbnails(files))
+    result = []
+    for _ in images:
+        ready = {}
+        for (format_, width, _, _), thumbnail in zip(variants, thumbnails):
+            if ready is not None and thumbnail is not None:
+                ready.setdefault(format_, []).append((width, thumbnail))
+            else:
+                ready = None
+        result.append(ready)
+    return result
+
+
+def ready_variants(image):
+    return ready_variants_many([image])[0]
+
+
+def _srcset(thumbnails):
+    return ', '.join(f'{thumbnail.url} {width}w'
+                     for width, thumbnail in thumbnails)
+
+
+def card_images(posts):
+    """{pk: src, srcset и sizes для <picture> карточки или None}.
+
+    Миниатюры всех постов страницы ищутся одним проходом. Пока готовы
+    не все варианты поста, их создание ставится в очередь.
+    """
+    images = dict.fromkeys(post.pk for post in posts)
+    with_image = [post for post in posts if post.image]
+    for post, variants in zip(with_image, ready_variants_many(
+            [post.image for post in with_image])):
+        if variants is None:
+            _queue(post)
+            continue
+        images[post.pk] = {
+            'src': variants['JPEG'][-1][1].url,
+            'srcset': _srcset(variants['JPEG']),
+            'webp_srcset': _srcset(variants['WEBP']),
+            'sizes': CARD_SIZES,
+        }
+    return images
+
+
+def build_variants(post_id):
+    """Создаёт недостающие варианты; True, если все готовы."""
+    post = Post.objects.filter(pk=post_id).only('image').first()
+    if post is None or not post.image:
+        return False
+    for _, _, geometry, options in card_variants():
+        get_thumbnail(post.image, geometry, **options)
+    return ready_variants(post.image) is not None
+
+
+def refresh(*post_ids):
+    """Новая версия постов - новые ключи карточек и ETag страниц."""
+    if not post_ids:
+        return
+    Post.objects.filter(pk__in=post_ids).update(updated=timezone.now())
+    object_cache.forget('post', *post_ids)
+    bump_feed_generation()
+    purge('feed', *(f'post:{post_id}' for post_id in post_ids))
+
+
+def generate(post_id):
+    """Создаёт варианты поста и обновляет страницы, где он показан."""
+    if build_variants(post_id):
+        refresh(post_id)
+
+
+def make_executor(workers):
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=thumbnail_worker.setup,
+    )
+
+
+def _submit(post_id):
+    """Отправляет задачу в пул; сломанный пул пересоздаётся при следующей
+    задаче, а эта выполняется здесь же - запрос не должен падать."""
+    global _executor
+    try:
+        if _executor is None:
+            _executor = make_executor(settings.CARD_THUMBNAIL_WORKERS)
+        _executor.submit(thumbnail_worker.generate, post_id)
+    except (BrokenProcessPool, RuntimeError, OSError):
+        logger.exception('Пул миниатюр недоступен')
+        _executor = None
+        thumbnail_worker.generate(post_id)
+
+
+def schedule(post):
+    """Ставит создание вариантов в пул процессов после коммита.
+
+    При CARD_THUMBNAIL_WORKERS = 0 варианты создаются сразу в этом процессе.
+    Повторные вызовы для того же изображения в течение
+    CARD_THUMBNAIL_QUEUE_TIMEOUT секунд игнорируются. Если такое же
+    изображение уже загружали, его варианты готовы и общие - ставить
+    нечего.
+    """
+    if post.image and ready_variants(post.image) is None:
+        _queue(post)
+
+
+def _queue(post):
+    if not cache.add(
+            f'thumbnail:queued:{post.pk}:{post.image.name}', True,
+            settings.CARD_THUMBNAIL_QUEUE_TIMEOUT):
+        return
+    if not settings.CARD_THUMBNAIL_WORKERS:
+        thumbnail_worker.generate(post.pk)
+        return
+    post_id = post.pk
+    transaction.on_commit(lambda: _submit(post_id))
@@ -0,0 +1,94 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from .models import Follow, Post, TimelineEntry
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+
+
+def _submit(func, *args):
+    """Выполняет func сразу или после коммита в пуле потоков."""
+    global _executor
+    workers = settings.TIMELINE_FANOUT_WORKERS
+    if not workers:
+        func(*args)
+        return
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=workers,
+                                       thread_name_prefix='timeline')
+    transaction.on_commit(
+        lambda: _executor.submit(_run_in_thread, func, *args)
+    )
+
+
+def _run_in_thread(func, *args):
+    """Задача пула: Future никто не проверяет, поэтому ошибка - в лог."""
+    try:
+        func(*args)
+    except Exception:
+        logger.exception('Не удалось обновить ленты: %s%r',
+                         func.__name__, args)
+    finally:
+        connection.close()
+
+
+def _bulk_insert(entries):
+    batch = []
+    for entry in entries:
+        batch.append(entry)
+        if len(batch) >= settings.TIMELINE_BATCH_SIZE:
+            TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def fan_out_post(post_id):
+    """Раскладывает пост в ленты всех подписчиков автора."""
+    post = Post.objects.filter(pk=post_id).values(
+        'author_id', 'pub_date'
+    ).first()
+    if post is None:
+        return
+    follower_ids = Follow.objects.filter(
+        author_id=post['author_id']
+    ).values_list('user_id', flat=True)
+    _bulk_insert(
+        TimelineEntry(user_id=user_id, post_id=post_id,
+                      author_id=post['author_id'],
+                      pub_date=post['pub_date'])
+        for user_id in follower_ids.iterator()
+    )
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту подписчика уже опубликованные посты автора."""
+    posts = Post.objects.filter(author_id=author_id).values_list(
+        'pk', 'pub_date'
+    )
+    _bulk_insert(
+        TimelineEntry(user_id=user_id, post_id=post_id,
+                      author_id=author_id, pub_date=pub_date)
+        for post_id, pub_date in posts.iterator()
+    )
+    if not Follow.objects.filter(user_id=user_id,
+                                 author_id=author_id).exists():
+        prune(user_id, author_id)
+
+
+def prune(user_id, author_id):
+    """Убирает из ленты подписчика посты автора после отписки."""
+    TimelineEntry.objects.filter(user_id=user_id,
+                                 author_id=author_id).delete()
+
+
+def schedule_fan_out(post):
+    _submit(fan_out_post, post.pk)
+
+
+def schedule_backfill(follow):
+    _submit(backfill, follow.user_id, follow.author_id)
@@ -0,0 +1,78 @@
+import os
+import threading
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from django.forms import ImageField
+from PIL import Image, ImageOps
+
+# Форматы фотографий: всегда перекодируются, чтобы применить поворот
+# по EXIF и выбросить метаданные (геопозиция, модель камеры).
+PHOTO_FORMATS = {'JPEG': 'JPEG', 'MPO': 'JPEG', 'WEBP': 'WEBP'}
+# Форматы, которые Pillow умеет декодировать сразу с уменьшением.
+DRAFT_FORMATS = {'JPEG', 'MPO'}
+EXTENSIONS = {'JPEG': '.jpg', 'WEBP': '.webp', 'PNG': '.png', 'GIF': '.gif'}
+
+_decoding = threading.BoundedSemaphore(settings.IMAGE_DECODE_CONCURRENCY)
+
+
+def _reencode(image, result, output_format, max_side):
+    with _decoding:
+        image.draft('RGB', (max_side, max_side))
+        icc_profile = image.info.get('icc_profile')
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((max_side, max_side))
+        if output_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+        # Без exif=: Pillow не переносит метаданные сам.
+        image.save(result, output_format,
+                   quality=settings.IMAGE_UPLOAD_QUALITY,
+                   icc_profile=icc_profile)
+
+
+def prepare_image(upload):
+    """Загруженное изображение, готовое к сохранению.
+
+    Image.open читает только заголовок. Фотографии и изображения больше
+    IMAGE_UPLOAD_MAX_SIDE декодируются (JPEG - в режиме draft, сразу
+    в 1/2-1/8 размера), уменьшаются, поворачиваются по EXIF и
+    записываются без метаданных во временный файл. Остальные файлы
+    возвращаются как есть.
+    """
+    max_side = settings.IMAGE_UPLOAD_MAX_SIDE
+    upload.seek(0)
+    with Image.open(upload) as image:
+        source_format = image.format
+        width, height = image.size
+        if (source_format not in DRAFT_FORMATS
+                and width * height > settings.IMAGE_UPLOAD_MAX_PIXELS):
+            raise ValidationError(
+                'Изображение слишком большое: %(width)s×%(height)s.',
+                code='image_too_large',
+                params={'width': width, 'height': height},
+            )
+        if (source_format not in PHOTO_FORMATS
+                and max(width, height) <= max_side):
+            upload.seek(0)
+            return upload
+        output_format = PHOTO_FORMATS.get(source_format, source_format)
+        name = os.path.splitext(upload.name)[0] + EXTENSIONS.get(
+            output_format, os.path.splitext(upload.name)[1]
+        )
+        result = TemporaryUploadedFile(
+            name, Image.MIME.get(output_format), 0, None
+        )
+        try:
+            _reencode(image, result, output_format, max_side)
+        except (OSError, Image.DecompressionBombError):
+            # verify() в ImageField.to_python не декодирует пиксели,
+            # поэтому обрезанный файл обнаруживается только здесь.
+            result.close()
+            raise ValidationError(
+                ImageField.default_error_messages['invalid_image'],
+                code='invalid_image',
+            )
+    result.size = result.tell()
+    result.seek(0)
+    return result
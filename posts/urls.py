@@ -6,12 +6,17 @@ urlpatterns = [
     path('', views.index, name='index'),
     path('new/', views.new_post, name='new_post'),
     path('follow/', views.follow_index, name='follow_index'),
+    path('search/', views.search, name='search'),
     path('group/<slug:slug>/', views.group_posts, name='group'),
     path('<str:username>/', views.profile, name='profile'),
     path('<str:username>/follow/',
          views.profile_follow, name='profile_follow'),
     path('<str:username>/unfollow/',
          views.profile_unfollow, name='profile_unfollow'),
+    path('<str:username>/follow.json', views.profile_follow_json,
+         {'follow': True}, name='profile_follow_json'),
+    path('<str:username>/unfollow.json', views.profile_follow_json,
+         {'follow': False}, name='profile_unfollow_json'),
     path('<str:username>/<int:post_id>/', views.post_view, name='post'),
     path('<str:username>/<int:post_id>/edit/',
          views.post_edit, name='post_edit'),
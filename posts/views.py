@@ -1,80 +1,141 @@
 from http import HTTPStatus
 
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth import get_user_model
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
+from django.db import transaction
+from django.http import JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
+from django.views.decorators.http import require_POST
 
+from . import object_cache, recommendations, thumbnails
+from .caching import feed_cache_context, mark_recent_write
+from .conditional import not_modified, page_etag, page_key
+from .feeds import follow_feed_page
 from .forms import CommentForm, PostForm
-from .models import Follow, Group, Post
+from .instrumentation import collect
+from .models import Follow, Post, UserStats
+from .page_cache import page_cache_stats, post_tags, tag_response
+from .pagination import paginate
+from .search import search_page
 
 User = get_user_model()
 
 
+def author_parts(author, stats, following):
+    """Всё, что карточка автора показывает помимо постов."""
+    return (author.username, author.get_full_name(), following,
+            stats.posts_count, stats.followers_count, stats.following_count)
+
+
 def index(request):
-    post_list = Post.objects.all()
-    page = Paginator(post_list, 10).get_page(request.GET.get('page'))
-    return render(request, 'index.html', {'page': page})
+    post_list = Post.objects.for_listing()
+    page = paginate(request, post_list)
+    cache_context = feed_cache_context(request, page)
+    etag = page_etag(request, page, page_key(page),
+                     cache_context['feed_cache_key'])
+    response = not_modified(request, etag)
+    if response is not None:
+        return response
+    response = render(request, 'index.html', {
+        'page': page,
+        **cache_context
+    }
+    )
+    response['ETag'] = etag
+    return tag_response(response, 'feed')
 
 
 def group_posts(request, slug):
-    group = get_object_or_404(Group, slug=slug)
-    post_list = group.posts.all()
-    page = Paginator(post_list, 10).get_page(request.GET.get('page'))
-    return render(request, 'group.html', {'group': group, 'page': page})
+    group = object_cache.get_group(slug)
+    post_list = group.posts.for_listing()
+    page = paginate(request, post_list)
+    etag = page_etag(request, page, page_key(page),
+                     group.title, group.description)
+    response = not_modified(request, etag)
+    if response is not None:
+        return response
+    response = render(request, 'group.html', {'group': group, 'page': page})
+    response['ETag'] = etag
+    return tag_response(response, f'group:{group.pk}', *post_tags(page))
 
 
 @login_required
+@transaction.atomic
 def new_post(request):
     form = PostForm(request.POST or None, files=request.FILES or None)
     if form.is_valid():
         post = form.save(commit=False)
         post.author = request.user
         post.save()
+        thumbnails.schedule(post)
+        mark_recent_write(request)
         return redirect('index')
     return render(request, 'new_post.html', {'form': form})
 
 
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    post_list = author.posts.all()
+    author = object_cache.get_user(username)
+    post_list = author.posts.for_listing()
     following = request.user.is_authenticated and Follow.objects.filter(
         user=request.user,
         author=author
     ).exists()
-    count_posts = author.posts.count()
-    page = Paginator(post_list, 10).get_page(request.GET.get('page'))
-    return render(request, 'profile.html', {
+    stats = UserStats.for_user(author)
+    suggestions = recommendations.suggestions_for(request.user)
+    page = paginate(request, post_list)
+    etag = page_etag(
+        request, page, page_key(page), *author_parts(author, stats, following),
+        [suggestion.author_id for suggestion in suggestions]
+    )
+    response = not_modified(request, etag)
+    if response is not None:
+        return response
+    response = render(request, 'profile.html', {
         'author': author,
         'page': page,
         'following': following,
-        'count_posts': count_posts
+        'stats': stats,
+        'count_posts': stats.posts_count,
+        'suggestions': suggestions,
     }
     )
+    response['ETag'] = etag
+    return tag_response(response, f'author:{author.pk}', *post_tags(page))
 
 
 def post_view(request, username, post_id):
-    post = get_object_or_404(Post, pk=post_id, author__username=username)
+    post = object_cache.get_post(username, post_id)
     author = post.author
-    count_posts = author.posts.count()
+    stats = UserStats.for_user(author)
     following = request.user.is_authenticated and Follow.objects.filter(
         user=request.user,
         author=author
     ).exists()
-    comments = post.comments.all()
+    etag = page_etag(
+        request, [post], *author_parts(author, stats, following)
+    )
+    response = not_modified(request, etag)
+    if response is not None:
+        return response
+    comments = post.comments.for_listing()
     form = CommentForm()
-    return render(request, 'post.html', {
+    response = render(request, 'post.html', {
         'author': author,
         'post': post,
         'comments': comments,
         'form': form,
         'following': following,
-        'count_posts': count_posts
+        'stats': stats,
+        'count_posts': stats.posts_count
     }
     )
+    response['ETag'] = etag
+    return tag_response(response, f'post:{post.pk}', f'author:{author.pk}')
 
 
 @login_required
+@transaction.atomic
 def add_comment(request, username, post_id):
     post = get_object_or_404(Post, pk=post_id, author__username=username)
     form = CommentForm(request.POST or None)
@@ -83,6 +144,7 @@ def add_comment(request, username, post_id):
         comment.author = request.user
         comment.post = post
         comment.save()
+        mark_recent_write(request)
     return redirect('post', username=username, post_id=post_id)
 
 
@@ -95,46 +157,87 @@ def post_edit(request, username, post_id):
     form = PostForm(request.POST or None, files=request.FILES or None,
                     instance=post)
     if form.is_valid():
-        form.save()
+        post = form.save(commit=False)
+        # Без update_fields запись вернула бы comments_count, прочитанный
+        # в начале запроса, и потеряла бы комментарии, добавленные за это
+        # время.
+        post.save(update_fields=[*PostForm.Meta.fields, 'updated'])
+        thumbnails.schedule(post)
+        mark_recent_write(request)
         return redirect('post', username=username, post_id=post_id)
     return render(request, 'new_post.html', {'form': form, 'post': post})
 
 
+def search(request):
+    query = request.GET.get('q', '').strip()
+    return render(request, 'search.html', {
+        'query': query,
+        'page': search_page(request, query),
+    })
+
+
 @login_required
 def follow_index(request):
-    post_list = Post.objects.filter(author__following__user=request.user)
-    page = Paginator(post_list, 10).get_page(request.GET.get('page'))
-    paginator = Paginator(post_list, 10)
-    return render(request, 'follow.html', {'page': page,
-                                           'paginator': paginator})
+    page = follow_feed_page(request)
+    return render(request, 'follow.html', {
+        'page': page,
+        'paginator': page.paginator,
+        'suggestions': recommendations.suggestions_for(request.user),
+    })
 
 
-@login_required
-def profile_follow(request, username):
-    author = get_object_or_404(User, username=username)
-    check_object = Follow.objects.filter(
-        user=request.user,
-        author=author
-    ).exists()
-    if author != request.user and not check_object:
-        Follow.objects.create(user=request.user, author=author)
+def change_follow(request, username, change):
+    """Follow.add или Follow.remove; True, если подписка изменилась."""
+    author = object_cache.get_user(username)
+    return author, change(request.user.pk, author.pk)
+
+
+def back_to_profile(request, username):
     if 'HTTP_REFERER' in request.META:
         return redirect(request.META['HTTP_REFERER'])
     return redirect('profile', username=username)
 
 
 @login_required
+@transaction.atomic
+def profile_follow(request, username):
+    change_follow(request, username, Follow.add)
+    return back_to_profile(request, username)
+
+
+@login_required
+@transaction.atomic
 def profile_unfollow(request, username):
-    author = get_object_or_404(User, username=username)
-    check_object = Follow.objects.filter(
-        user=request.user,
-        author=author
-    ).exists()
-    if author != request.user and check_object:
-        Follow.objects.filter(user=request.user, author=author).delete()
-    if 'HTTP_REFERER' in request.META:
-        return redirect(request.META['HTTP_REFERER'])
-    return redirect('profile', username=username)
+    change_follow(request, username, Follow.remove)
+    return back_to_profile(request, username)
+
+
+@require_POST
+@transaction.atomic
+def profile_follow_json(request, username, follow):
+    """Подписка без перезагрузки страницы: новое состояние и счётчики."""
+    if not request.user.is_authenticated:
+        return JsonResponse({'error': 'Требуется вход'},
+                            status=HTTPStatus.UNAUTHORIZED)
+    author, changed = change_follow(
+        request, username, Follow.add if follow else Follow.remove
+    )
+    stats = UserStats.for_users([author.pk, request.user.pk])
+    return JsonResponse({
+        'following': follow and author != request.user,
+        'changed': changed,
+        'followers_count': stats[author.pk].followers_count,
+        'following_count': stats[request.user.pk].following_count,
+    })
+
+
+@staff_member_required
+def request_stats(request):
+    return render(request, 'misc/request_stats.html', {
+        'rows': collect(),
+        'page_cache': page_cache_stats()
+    }
+    )
 
 
 def page_not_found(request, exception):
@@ -1,4 +1,8 @@
+import atexit
 import os
+import shutil
+import sys
+import tempfile
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -37,6 +41,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'posts.instrumentation.RequestStatsMiddleware',
+    'posts.instrumentation.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -44,6 +50,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'posts.page_cache.AnonymousPageCacheMiddleware',
 ]
 
 ROOT_URLCONF = 'yatube.urls'
@@ -51,7 +58,7 @@ ROOT_URLCONF = 'yatube.urls'
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'posts.instrumentation.InstrumentedTemplates',
         'DIRS': [TEMPLATES_DIR],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -97,6 +104,19 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Пользователь сессии загружается из кеша объектов (posts.object_cache).
+# ModelBackend остаётся в списке для сессий, созданных до перехода:
+# в них сохранён его путь, и без него auth.get_user их бы отверг.
+AUTHENTICATION_BACKENDS = [
+    'posts.backends.CachedModelBackend',
+    'django.contrib.auth.backends.ModelBackend',
+]
+
+# Сессии в общем кеше; изменения данных пишутся в БД сразу, продление
+# срока без изменений - не чаще раза в SESSION_WRITE_BEHIND секунд
+SESSION_ENGINE = 'posts.sessions'
+SESSION_WRITE_BEHIND = 60
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/2.2/topics/i18n/
@@ -121,13 +141,111 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
-
+# Загрузки больше 256 КБ пишутся во временный файл кусками по 64 КБ,
+# а не собираются в памяти процесса.
+FILE_UPLOAD_MAX_MEMORY_SIZE = 256 * 1024
+# Загрузки хранятся под хешем содержимого, дубликаты - одним файлом
+# (posts.storage). Миниатюры sorl пишутся под своими именами как есть.
+DEFAULT_FILE_STORAGE = 'posts.storage.ContentAddressedStorage'
+THUMBNAIL_STORAGE = 'django.core.files.storage.FileSystemStorage'
+
+# Один кеш на все процессы машины: файл SQLite в режиме WAL.
+# Истёкшее значение ещё STALE_GRACE секунд отдаётся остальным процессам,
+# пока один из них его пересчитывает (posts.cache_backend.SQLiteCache).
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'posts.cache_backend.SQLiteCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache', 'default.sqlite3'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+            'STALE_GRACE': 60,
+            'EARLY_REFRESH_BETA': 1.0,
+        },
     }
 }
 
+# Posts
+
+POSTS_PER_PAGE = 10
+# 'page' - классическая пагинация ?page=N с COUNT(*),
+# 'cursor' - keyset-пагинация по (pub_date, id) с токенами ?cursor=...
+# Ссылки вида ?page=N продолжают работать в обоих режимах.
+POSTS_PAGINATION = 'page'
+# Лента подписок материализуется при записи (fan-out-on-write): после
+# коммита в пуле из N потоков, чтобы запрос не ждал раскладки по всем
+# подписчикам. 0 - синхронно в запросе.
+TIMELINE_FANOUT_WORKERS = 2
+TIMELINE_BATCH_SIZE = 500
+# Движок ленты подписок:
+# 'timeline' - материализованная лента, 'join' - JOIN по Follow,
+# 'merge' - k-way слияние потоков постов отдельных авторов.
+FOLLOW_FEED_ENGINE = 'timeline'
+# Кеш общей ленты: ключи с поколением, которое сбрасывают записи
+# постов и комментариев, поэтому TTL может быть большим.
+FEED_CACHE_TTL = 60 * 60 * 3
+# Сколько секунд автор только что сделанной записи читает ленту мимо кеша
+FEED_CACHE_BYPASS = 60
+# Кеш целых страниц для анонимных посетителей со сбросом по суррогатным
+# ключам (posts.page_cache). В режиме разработки выключен.
+PAGE_CACHE_ENABLED = not DEBUG
+PAGE_CACHE_TTL = 60 * 60
+PAGE_CACHE_VIEWS = ('index', 'group', 'profile', 'post')
+# Отрендеренные карточки постов (posts.templatetags.post_cards).
+# Ключ включает Post.updated, правки и комментарии дают новый ключ.
+POST_CARD_CACHE_TTL = 60 * 60 * 24
+# Кеш объектов User, Group и Post для разбора URL (posts.object_cache):
+# общий кеш со сбросом по сигналам и LRU процесса перед ним. Сброс из
+# другого процесса доходит до LRU не позже OBJECT_CACHE_LOCAL_TTL секунд.
+OBJECT_CACHE_TTL = 60 * 60
+OBJECT_CACHE_LOCAL_TTL = 5
+OBJECT_CACHE_LOCAL_SIZE = 1000
+# Сколько секунд помнить, что username или slug не найден
+NEGATIVE_CACHE_TTL = 60
+# Фильтры Блума существующих username и slug групп отсекают запросы
+# к несуществующим именам до обращения к БД
+BLOOM_FILTER_ERROR_RATE = 0.01
+BLOOM_FILTER_TTL = 60 * 60 * 24
+# Миниатюры карточек создаются в пуле процессов после сохранения поста
+# (posts.thumbnails), до готовности карточка показывает оригинал.
+# 0 - создавать сразу в процессе запроса.
+CARD_THUMBNAIL_WORKERS = 2
+CARD_THUMBNAIL_QUEUE_TIMEOUT = 60 * 5
+# Рекомендации «Кого читать» (posts.recommendations): top-K авторов
+# на пользователя пересчитывает команда build_suggestions, страницы
+# показывают первые SUGGESTIONS_SHOWN.
+SUGGESTIONS_TOP_K = 20
+SUGGESTIONS_SHOWN = 5
+SUGGESTIONS_BATCH_SIZE = 1000
+# Обработка загруженных изображений (posts.uploads): уменьшение до
+# IMAGE_UPLOAD_MAX_SIDE по большей стороне, поворот по EXIF, удаление
+# метаданных. JPEG декодируется сразу в уменьшенном виде (draft), другие
+# форматы - целиком, поэтому их размер ограничен IMAGE_UPLOAD_MAX_PIXELS.
+# Одновременно процесс декодирует не больше IMAGE_DECODE_CONCURRENCY
+# изображений.
+IMAGE_UPLOAD_MAX_SIDE = 2048
+IMAGE_UPLOAD_MAX_PIXELS = 4096 * 4096
+IMAGE_UPLOAD_QUALITY = 85
+IMAGE_DECODE_CONCURRENCY = 2
+
+# Статистика запросов (posts.instrumentation.RequestStatsMiddleware)
+
+# Сколько последних запросов каждого view учитывать
+REQUEST_STATS_WINDOW = 1000
+# Как часто процесс выкладывает сводку в кеш, секунд
+REQUEST_STATS_PUBLISH_INTERVAL = 10
+REQUEST_STATS_TTL = 300
+# Сколько процессов одновременно выкладывают сводки
+REQUEST_STATS_MAX_PROCESSES = 64
+
+# Выборочное профилирование (posts.instrumentation.ProfilingMiddleware)
+
+# Профилировать каждый N-й запрос, 0 - только по заголовку
+PROFILING_SAMPLE_RATE = 0
+# Заголовок X-Profile с токеном из manage.py profiling_token
+PROFILING_HEADER = 'HTTP_X_PROFILE'
+PROFILING_TOKEN_MAX_AGE = 60 * 60 * 24
+PROFILING_DIR = os.path.join(BASE_DIR, 'profiles')
+
 # Login
 
 LOGIN_URL = '/auth/login/'
@@ -138,3 +256,18 @@ LOGIN_REDIRECT_URL = 'index'
 EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 # указываем директорию, в которую будут складываться файлы писем
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
+
+# У тестов свой файл кеша во временном каталоге: иначе они видели бы
+# сессии и объекты сервера разработки, а cache.clear() стирал бы их.
+# Каталог передаётся дочерним процессам (пул миниатюр) через окружение.
+if sys.argv[1:2] == ['test'] or 'pytest' in sys.modules:
+    TEST_CACHE_DIR = os.environ.get('YATUBE_TEST_CACHE_DIR')
+    if TEST_CACHE_DIR is None:
+        TEST_CACHE_DIR = tempfile.mkdtemp(prefix='yatube-test-cache-')
+        os.environ['YATUBE_TEST_CACHE_DIR'] = TEST_CACHE_DIR
+        atexit.register(shutil.rmtree, TEST_CACHE_DIR, ignore_errors=True)
+    CACHES['default']['LOCATION'] = os.path.join(TEST_CACHE_DIR,
+                                                 'default.sqlite3')
+    # Транзакция TestCase не коммитится, и после коммита пул ничего
+    # бы не получил.
+    TIMELINE_FANOUT_WORKERS = 0
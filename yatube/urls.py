@@ -4,12 +4,15 @@ from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path
 
+from posts.views import request_stats
+
 handler404 = "posts.views.page_not_found"
 handler500 = "posts.views.server_error"
 
 urlpatterns = [
     path('auth/', include('users.urls')),
     path('auth/', include('django.contrib.auth.urls')),
+    path('admin/request-stats/', request_stats, name='request_stats'),
     path('admin/', admin.site.urls),
     path('about/', include('about.urls', namespace='about')),
     path('', include('posts.urls')),